@@ -0,0 +1,147 @@
+"""Measure the memory and time it takes to build the entities of large accounts.
+
+Usage: python -m benchmarks.bench_entities [--devices 500] [--json results.json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+import gc
+import importlib
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from .fake_melcloud import FakeMelCloud
+from .harness import DOMAIN, PLATFORMS, async_environment
+
+DEFAULT_DEVICES = 500
+# Metrics compared against a baseline, all of them lower is better.
+COMPARED_METRICS = (
+    "wrap_kib_per_device",
+    "entity_kib_per_device",
+    "build_ms_per_device",
+)
+
+
+@dataclass
+class EntityResult:
+    """Measurements of building the entities of an account."""
+
+    devices: int
+    entities_per_device: float
+    wrap_kib_per_device: float
+    entity_kib_per_device: float
+    build_ms_per_device: float
+
+
+def _measure(build: Any) -> tuple[Any, int, float]:
+    """Return what build returns, the bytes it kept allocated and its duration."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        result = build()
+        duration = time.perf_counter() - start
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, allocated, duration
+
+
+async def async_run(args: argparse.Namespace) -> EntityResult:
+    """Build the device wrappers and entities of a synthetic account."""
+    atw_count = round(args.devices * args.atw_share)
+    fake = FakeMelCloud(ata_count=args.devices - atw_count, atw_count=atw_count)
+    async with async_environment(fake) as environment:
+        integration = importlib.import_module(f"custom_components.{DOMAIN}")
+        platforms = [
+            importlib.import_module(f"custom_components.{DOMAIN}.{platform}")
+            for platform in PLATFORMS
+        ]
+        coordinator = environment.coordinator
+        devices = {
+            device_type: [mel_device.device for mel_device in mel_devices]
+            for device_type, mel_devices in coordinator.mel_devices.items()
+        }
+
+        # Wrap the pymelcloud devices of the account again.
+        wrapped, wrap_bytes, _ = _measure(
+            lambda: integration.wrap_devices(devices, coordinator.governor)
+        )
+        mel_devices = [
+            mel_device for mel_devices in wrapped.values() for mel_device in mel_devices
+        ]
+        entities, entity_bytes, duration = _measure(
+            lambda: [
+                entity
+                for platform in platforms
+                for entity in platform.create_entities(coordinator, mel_devices)
+            ]
+        )
+        count = len(mel_devices)
+        return EntityResult(
+            devices=count,
+            entities_per_device=round(len(entities) / count, 2),
+            wrap_kib_per_device=round(wrap_bytes / 1024 / count, 2),
+            entity_kib_per_device=round(entity_bytes / 1024 / count, 2),
+            build_ms_per_device=round(duration * 1000 / count, 3),
+        )
+
+
+def compare(result: EntityResult, baseline: dict, tolerance: float) -> list[str]:
+    """Return the metrics that regressed by more than tolerance."""
+    regressions = []
+    for metric in COMPARED_METRICS:
+        value = getattr(result, metric)
+        if (limit := baseline[metric] * (1 + tolerance)) and value > limit:
+            regressions.append(
+                f"{metric}: {value} > {baseline[metric]} (+{tolerance:.0%})"
+            )
+    return regressions
+
+
+def main() -> int:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--devices", type=int, default=DEFAULT_DEVICES, help="devices of the account"
+    )
+    parser.add_argument(
+        "--atw-share", type=float, default=0.2, help="share of Air-to-Water devices"
+    )
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument("--compare", help="fail on regressions against this file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed relative regression"
+    )
+    args = parser.parse_args()
+
+    result = asyncio.run(async_run(args))
+    print(
+        f"{result.devices:>5} devices {result.entities_per_device:>5.1f} entities each | "
+        f"wrappers {result.wrap_kib_per_device:>6.2f} KiB | "
+        f"entities {result.entity_kib_per_device:>6.2f} KiB | "
+        f"build {result.build_ms_per_device:>6.3f} ms per device"
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(asdict(result), file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(result, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""Measure setup and refresh cost of the integration at different account sizes.
+
+Usage: python -m benchmarks.bench_scaling [--sizes 1,50,500] [--json results.json]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import sys
+import time
+import tracemalloc
+
+from .fake_melcloud import FakeMelCloud
+from .harness import async_environment, async_setup_entry
+
+DEFAULT_SIZES = (1, 50, 500)
+# Metrics compared against a baseline, all of them lower is better.
+COMPARED_METRICS = (
+    "setup_seconds",
+    "requests_per_cycle",
+    "cpu_ms_per_cycle",
+    "memory_kib_per_entity",
+)
+
+
+@dataclass
+class ScalingResult:
+    """Measurements for a single account size."""
+
+    devices: int
+    entities: int
+    setup_seconds: float
+    setup_requests: int
+    requests_per_cycle: float
+    deferred_requests: int
+    cpu_ms_per_cycle: float
+    memory_kib_per_entity: float
+
+
+def _create_fake(devices: int, args: argparse.Namespace) -> FakeMelCloud:
+    """Create the stand-in account with the configured device mix."""
+    atw_count = round(devices * args.atw_share)
+    return FakeMelCloud(
+        ata_count=devices - atw_count,
+        atw_count=atw_count,
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+
+
+async def _async_measure_cycles(
+    devices: int, args: argparse.Namespace
+) -> ScalingResult:
+    """Measure setup time and the cost of full refresh cycles."""
+    fake = _create_fake(devices, args)
+    async with async_environment(fake, setup=False) as environment:
+        hass = environment.hass
+        start = time.perf_counter()
+        await async_setup_entry(environment)
+        setup_seconds = time.perf_counter() - start
+        setup_requests = fake.total_requests
+
+        coordinator = environment.coordinator
+        deferred = coordinator.governor.deferred
+        requests = 0
+        cpu_seconds = 0.0
+        for cycle in range(args.cycles):
+            for state in fake.states.values():
+                if "RoomTemperature" in state:
+                    state["RoomTemperature"] = 20.0 + cycle % 3
+            coordinator.scheduler.reset()
+            environment.refill_budget()
+            fake.requests.clear()
+            start = time.process_time()
+            await coordinator.async_refresh()
+            await hass.async_block_till_done()
+            cpu_seconds += time.process_time() - start
+            requests += fake.total_requests
+        environment.check_ready()
+
+        return ScalingResult(
+            devices=devices,
+            entities=environment.entity_count,
+            setup_seconds=round(setup_seconds, 3),
+            setup_requests=setup_requests,
+            requests_per_cycle=round(requests / args.cycles, 1),
+            deferred_requests=coordinator.governor.deferred - deferred,
+            cpu_ms_per_cycle=round(cpu_seconds * 1000 / args.cycles, 2),
+            memory_kib_per_entity=0.0,
+        )
+
+
+async def _async_measure_memory(devices: int, args: argparse.Namespace) -> float:
+    """Return the memory allocated by the set up in KiB per entity."""
+    fake = _create_fake(devices, args)
+    async with async_environment(fake, setup=False) as environment:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            await async_setup_entry(environment)
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+        return allocated / 1024 / max(environment.entity_count, 1)
+
+
+async def async_run(args: argparse.Namespace) -> list[ScalingResult]:
+    """Run the benchmark for every configured account size."""
+    results = []
+    for devices in args.sizes:
+        result = await _async_measure_cycles(devices, args)
+        result.memory_kib_per_entity = round(
+            await _async_measure_memory(devices, args), 2
+        )
+        results.append(result)
+        print(
+            f"{result.devices:>5} devices {result.entities:>6} entities | "
+            f"setup {result.setup_seconds:>7.3f} s ({result.setup_requests} requests) | "
+            f"cycle {result.requests_per_cycle:>6.1f} requests "
+            f"({result.deferred_requests} deferred) "
+            f"{result.cpu_ms_per_cycle:>8.2f} ms CPU | "
+            f"{result.memory_kib_per_entity:>6.2f} KiB/entity"
+        )
+    return results
+
+
+def compare(
+    results: list[ScalingResult], baseline: list[dict], tolerance: float
+) -> list[str]:
+    """Return the metrics that regressed by more than tolerance.
+
+    Cycles with deferred requests did not refresh every device, so they
+    always count as a regression.
+    """
+    by_size = {entry["devices"]: entry for entry in baseline}
+    regressions = []
+    for result in results:
+        if result.deferred_requests:
+            regressions.append(
+                f"deferred_requests at {result.devices} devices: "
+                f"{result.deferred_requests} > 0"
+            )
+        if (reference := by_size.get(result.devices)) is None:
+            continue
+        for metric in COMPARED_METRICS:
+            value = getattr(result, metric)
+            if (limit := reference[metric] * (1 + tolerance)) and value > limit:
+                regressions.append(
+                    f"{metric} at {result.devices} devices: "
+                    f"{value} > {reference[metric]} (+{tolerance:.0%})"
+                )
+    return regressions
+
+
+def main() -> int:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=list(DEFAULT_SIZES),
+        help="comma separated device counts",
+    )
+    parser.add_argument("--cycles", type=int, default=5, help="refresh cycles")
+    parser.add_argument(
+        "--atw-share", type=float, default=0.2, help="share of Air-to-Water devices"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="server latency in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of failed requests"
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="fail on regressions against this file")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="allowed relative regression"
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(async_run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
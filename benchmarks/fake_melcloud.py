@@ -0,0 +1,324 @@
+"""Offline stand-in for the MELCloud endpoints used by pymelcloud."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import json
+import random
+from typing import Any
+
+from aiohttp import web
+
+API_PREFIX = "/Mitsubishi.Wifi.Client"
+
+DEVICE_TYPE_ATA = 0
+DEVICE_TYPE_ATW = 1
+
+DEVICES_PER_BUILDING = 20
+
+
+def _timestamp(when: datetime) -> str:
+    """Format a timestamp the way MELCloud does."""
+    return when.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _ata_device(device_id: int, building_id: int) -> dict[str, Any]:
+    """Build a synthetic Air-to-Air device configuration."""
+    return {
+        "DeviceID": device_id,
+        "DeviceName": f"ATA {device_id}",
+        "BuildingID": building_id,
+        "MacAddress": f"00:00:00:00:{device_id // 256:02x}:{device_id % 256:02x}",
+        "SerialNumber": f"ata-{device_id}",
+        "AccessLevel": 4,
+        "HideVaneControls": False,
+        "Device": {
+            "DeviceType": DEVICE_TYPE_ATA,
+            "CanHeat": True,
+            "CanDry": True,
+            "CanCool": True,
+            "ModelSupportsAuto": True,
+            "ModelSupportsFanSpeed": True,
+            "HasAutomaticFanSpeed": True,
+            "ModelSupportsVaneHorizontal": True,
+            "ModelSupportsVaneVertical": True,
+            "SwingFunction": True,
+            "HasEnergyConsumedMeter": True,
+            "CurrentEnergyConsumed": 1000.0 * device_id,
+            "TemperatureIncrement": 0.5,
+            "MinTempHeat": 10.0,
+            "MaxTempHeat": 31.0,
+            "MinTempCoolDry": 16.0,
+            "MaxTempCoolDry": 31.0,
+            "MinTempAutomatic": 16.0,
+            "MaxTempAutomatic": 31.0,
+            "NumberOfFanSpeeds": 5,
+            "Power": True,
+            "OperationMode": 1,
+            "RoomTemperature": 21.0,
+            "SetTemperature": 22.0,
+            "FanSpeed": 3,
+            "VaneHorizontalDirection": 0,
+            "VaneVerticalDirection": 0,
+            "Offline": False,
+        },
+    }
+
+
+def _atw_device(device_id: int, building_id: int) -> dict[str, Any]:
+    """Build a synthetic Air-to-Water device configuration with two zones."""
+    return {
+        "DeviceID": device_id,
+        "DeviceName": f"ATW {device_id}",
+        "BuildingID": building_id,
+        "MacAddress": f"00:00:00:01:{device_id // 256:02x}:{device_id % 256:02x}",
+        "SerialNumber": f"atw-{device_id}",
+        "AccessLevel": 4,
+        "Device": {
+            "DeviceType": DEVICE_TYPE_ATW,
+            "CanCool": False,
+            "HasThermostatZone1": True,
+            "HasZone2": True,
+            "HasThermostatZone2": True,
+            "MaxTankTemperature": 60.0,
+            "TemperatureIncrement": 0.5,
+            "FlowTemperature": 35.0,
+            "ReturnTemperature": 30.0,
+            "Power": True,
+            "OperationMode": 2,
+            "TankWaterTemperature": 48.0,
+            "SetTankWaterTemperature": 50.0,
+            "OutdoorTemperature": 5.0,
+            "RoomTemperatureZone1": 21.0,
+            "RoomTemperatureZone2": 20.0,
+            "SetTemperatureZone1": 21.5,
+            "SetTemperatureZone2": 20.5,
+            "OperationModeZone1": 0,
+            "OperationModeZone2": 0,
+            "IdleZone1": False,
+            "IdleZone2": True,
+            "ForcedHotWaterMode": False,
+            "HolidayMode": False,
+            "ProhibitZone1": False,
+            "ProhibitZone2": False,
+            "Offline": False,
+            "CurrentEnergyConsumed": 900.0,
+            "CurrentEnergyProduced": 3200.0,
+            "DailyHeatingEnergyConsumed": 4.0,
+            "DailyHeatingEnergyProduced": 13.0,
+            "Zone1Name": "Ground floor",
+            "Zone2Name": "First floor",
+        },
+    }
+
+
+_ATA_STATE_KEYS = (
+    "Power",
+    "OperationMode",
+    "RoomTemperature",
+    "SetTemperature",
+    "NumberOfFanSpeeds",
+    "Offline",
+)
+_ATW_STATE_KEYS = (
+    "Power",
+    "OperationMode",
+    "TankWaterTemperature",
+    "SetTankWaterTemperature",
+    "OutdoorTemperature",
+    "RoomTemperatureZone1",
+    "RoomTemperatureZone2",
+    "SetTemperatureZone1",
+    "SetTemperatureZone2",
+    "OperationModeZone1",
+    "OperationModeZone2",
+    "IdleZone1",
+    "IdleZone2",
+    "ForcedHotWaterMode",
+    "HolidayMode",
+    "ProhibitZone1",
+    "ProhibitZone2",
+    "Offline",
+)
+
+# State fields named differently in ListDevices entries.
+_LISTING_NAMES = {
+    "SetFanSpeed": "FanSpeed",
+    "VaneHorizontal": "VaneHorizontalDirection",
+    "VaneVertical": "VaneVerticalDirection",
+}
+
+
+@dataclass
+class FakeMelCloud:
+    """In-memory MELCloud account served over HTTP."""
+
+    ata_count: int = 1
+    atw_count: int = 0
+    latency: float = 0.0
+    error_rate: float = 0.0
+    communication_interval: timedelta = timedelta(seconds=60)
+    seed: int = 0
+    confs: list[dict[str, Any]] = field(default_factory=list)
+    states: dict[int, dict[str, Any]] = field(default_factory=dict)
+    requests: Counter[str] = field(default_factory=Counter)
+    _runner: web.AppRunner | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        """Generate the synthetic devices."""
+        self._random = random.Random(self.seed)
+        for index in range(self.ata_count + self.atw_count):
+            device_id = index + 1
+            building_id = index // DEVICES_PER_BUILDING + 1
+            if index < self.ata_count:
+                conf = _ata_device(device_id, building_id)
+                keys = _ATA_STATE_KEYS
+            else:
+                conf = _atw_device(device_id, building_id)
+                keys = _ATW_STATE_KEYS
+            self.confs.append(conf)
+            state = {key: conf["Device"][key] for key in keys}
+            state.update(
+                {
+                    "DeviceID": device_id,
+                    "DeviceType": conf["Device"]["DeviceType"],
+                    "EffectiveFlags": 0,
+                    "HasPendingCommand": False,
+                }
+            )
+            if conf["Device"]["DeviceType"] == DEVICE_TYPE_ATA:
+                state.update({"SetFanSpeed": 3, "VaneHorizontal": 0, "VaneVertical": 0})
+            self.states[device_id] = state
+
+    @property
+    def total_requests(self) -> int:
+        """Return the number of requests served so far."""
+        return sum(self.requests.values())
+
+    def _stamp(self, state: dict[str, Any]) -> dict[str, Any]:
+        """Return a copy of the state with fresh communication timestamps."""
+        now = datetime.utcnow()
+        return {
+            **state,
+            "LastCommunication": _timestamp(now),
+            "NextCommunication": _timestamp(now + self.communication_interval),
+        }
+
+    def _buildings(self) -> list[dict[str, Any]]:
+        """Group device configurations by building like ListDevices does."""
+        buildings: dict[int, list[dict[str, Any]]] = {}
+        for conf in self.confs:
+            device = conf["Device"]
+            for key, value in self.states[conf["DeviceID"]].items():
+                key = _LISTING_NAMES.get(key, key)
+                if key in device:
+                    device[key] = value
+            buildings.setdefault(conf["BuildingID"], []).append(conf)
+        return [
+            {
+                "ID": building_id,
+                "Name": f"Building {building_id}",
+                "Structure": {"Devices": devices, "Areas": [], "Floors": []},
+            }
+            for building_id, devices in buildings.items()
+        ]
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        """Count requests and inject latency and failures."""
+        self.requests[request.path.removeprefix(API_PREFIX)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise web.HTTPServiceUnavailable()
+        return await handler(request)
+
+    async def _login(self, request: web.Request) -> web.Response:
+        """Issue a token valid for a year."""
+        expiry = datetime.utcnow() + timedelta(days=365)
+        return web.json_response(
+            {"ErrorId": None, "LoginData": {"ContextKey": "token", "Expiry": expiry}},
+            dumps=_json_dumps,
+        )
+
+    async def _user_details(self, request: web.Request) -> web.Response:
+        """Return the account details."""
+        return web.json_response({"UseFahrenheit": False})
+
+    async def _list_devices(self, request: web.Request) -> web.Response:
+        """Return every device of the account grouped by building."""
+        return web.json_response(self._buildings())
+
+    async def _get(self, request: web.Request) -> web.Response:
+        """Return the state of a single device."""
+        device_id = int(request.query["id"])
+        if device_id not in self.states:
+            raise web.HTTPNotFound()
+        return web.json_response(self._stamp(self.states[device_id]))
+
+    async def _set(self, request: web.Request) -> web.Response:
+        """Apply a SetAta or SetAtw request to the device state."""
+        body = await request.json()
+        state = self.states[body["DeviceID"]]
+        state.update({key: value for key, value in body.items() if key in state})
+        state["EffectiveFlags"] = 0
+        return web.json_response(self._stamp(state))
+
+    async def _units(self, request: web.Request) -> web.Response:
+        """Return the indoor unit of a device."""
+        return web.json_response(
+            [{"Model": "Indoor", "ModelNumber": 1, "SerialNumber": "1"}]
+        )
+
+    async def _energy_report(self, request: web.Request) -> web.Response:
+        """Return an energy report with hourly or daily buckets."""
+        body = await request.json()
+        start = datetime.fromisoformat(body["FromDate"])
+        end = datetime.fromisoformat(body["ToDate"])
+        if end - start <= timedelta(days=1):
+            buckets = 24
+        else:
+            buckets = (end - start).days
+        report: dict[str, Any] = {
+            mode: [0.0] * buckets for mode in ("Cooling", "Auto", "Dry", "Fan", "Other")
+        }
+        report["Heating"] = [0.1 * (index % 5) for index in range(buckets)]
+        report["FromDate"] = body["FromDate"]
+        report["ToDate"] = body["ToDate"]
+        return web.json_response(report)
+
+    def create_app(self) -> web.Application:
+        """Create the aiohttp application serving this account."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post(f"{API_PREFIX}/Login/ClientLogin", self._login)
+        app.router.add_get(f"{API_PREFIX}/User/GetUserDetails", self._user_details)
+        app.router.add_get(f"{API_PREFIX}/User/ListDevices", self._list_devices)
+        app.router.add_get(f"{API_PREFIX}/Device/Get", self._get)
+        app.router.add_post(f"{API_PREFIX}/Device/SetAta", self._set)
+        app.router.add_post(f"{API_PREFIX}/Device/SetAtw", self._set)
+        app.router.add_post(f"{API_PREFIX}/Device/ListDeviceUnits", self._units)
+        app.router.add_post(f"{API_PREFIX}/EnergyCost/Report", self._energy_report)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the base URL pymelcloud should use."""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        sockets = site._server.sockets  # pylint: disable=protected-access
+        bound_port = sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}{API_PREFIX}"
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def _json_dumps(data: Any) -> str:
+    """Serialize responses containing timestamps."""
+    return json.dumps(data, default=_timestamp)
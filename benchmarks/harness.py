@@ -0,0 +1,162 @@
+"""Run the integration inside a bare Home Assistant against the stand-in server."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import partial
+import importlib
+import logging
+from pathlib import Path
+import tempfile
+from typing import Any
+from unittest.mock import patch
+
+import pymelcloud.client
+
+from homeassistant import core, loader
+from homeassistant.config_entries import ConfigEntries, ConfigEntry
+from homeassistant.const import CONF_TOKEN, CONF_USERNAME
+from homeassistant.helpers import (
+    area_registry,
+    device_registry,
+    entity,
+    entity_registry,
+    issue_registry,
+)
+
+from .fake_melcloud import FakeMelCloud
+
+DOMAIN = "melcloud"
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "melcloudexp"
+# Platforms building entities from the devices of an account.
+PLATFORMS = ("climate", "sensor", "water_heater")
+# Request budget per device on top of the default bucket. The benchmarks
+# measure the integration, so the budget must cover setting every device up.
+BUDGET_PER_DEVICE = 5
+
+
+class BenchmarkError(Exception):
+    """The integration did not reach the state the benchmark measures."""
+
+
+@dataclass
+class BenchmarkEnvironment:
+    """Home Assistant instance with one MELCloud account set up."""
+
+    hass: core.HomeAssistant
+    fake: FakeMelCloud
+    entry: ConfigEntry
+
+    @property
+    def coordinator(self) -> Any:
+        """Return the coordinator of the account."""
+        return self.hass.data[DOMAIN][self.entry.entry_id]
+
+    @property
+    def expected_entity_count(self) -> int:
+        """Return the number of entities of the account and all of its devices."""
+        platforms = {
+            platform: importlib.import_module(f"custom_components.{DOMAIN}.{platform}")
+            for platform in PLATFORMS
+        }
+        return len(platforms["sensor"].ACCOUNT_SENSORS) + sum(
+            len(module.create_entities(self.coordinator, self.coordinator.devices))
+            for module in platforms.values()
+        )
+
+    def check_ready(self) -> None:
+        """Raise BenchmarkError unless every device and entity has been set up."""
+        devices = self.coordinator.devices
+        if unready := sum(not mel_device.ready for mel_device in devices):
+            raise BenchmarkError(f"{unready} of {len(devices)} devices are not ready")
+        if (count := self.entity_count) != (expected := self.expected_entity_count):
+            raise BenchmarkError(f"{count} entities created, expected {expected}")
+
+    def refill_budget(self) -> None:
+        """Refill the request budget so every measured cycle starts alike."""
+        governor = self.coordinator.governor
+        governor._tokens = float(governor.capacity)  # pylint: disable=protected-access
+
+    @property
+    def entity_count(self) -> int:
+        """Return the number of entities created by the integration."""
+        return len(
+            entity_registry.async_entries_for_config_entry(
+                entity_registry.async_get(self.hass), self.entry.entry_id
+            )
+        )
+
+
+async def async_start_hass(config_dir: str) -> core.HomeAssistant:
+    """Start a minimal Home Assistant loading the integration as a custom component."""
+    custom_components = Path(config_dir) / "custom_components"
+    custom_components.mkdir(exist_ok=True)
+    (custom_components / DOMAIN).symlink_to(PACKAGE_DIR, target_is_directory=True)
+
+    hass = core.HomeAssistant()
+    hass.config.config_dir = config_dir
+    hass.config.skip_pip = True
+    entity.async_setup(hass)
+    await asyncio.gather(
+        area_registry.async_load(hass),
+        device_registry.async_load(hass),
+        entity_registry.async_load(hass),
+        issue_registry.async_load(hass),
+    )
+    hass.config_entries = ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    hass.state = core.CoreState.running
+    return hass
+
+
+def create_entry() -> ConfigEntry:
+    """Create the config entry of the synthetic account."""
+    return ConfigEntry(
+        version=1,
+        domain=DOMAIN,
+        title="benchmark@example.com",
+        data={CONF_USERNAME: "benchmark@example.com", CONF_TOKEN: "token"},
+        source="user",
+        unique_id="benchmark@example.com",
+    )
+
+
+@asynccontextmanager
+async def async_environment(
+    fake: FakeMelCloud, *, setup: bool = True
+) -> AsyncIterator[BenchmarkEnvironment]:
+    """Serve the fake account and set up the integration against it."""
+    logging.getLogger("homeassistant.loader").setLevel(logging.ERROR)
+    pymelcloud.client.BASE_URL = await fake.start()
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await async_start_hass(config_dir)
+        environment = BenchmarkEnvironment(hass, fake, create_entry())
+        component = (await loader.async_get_integration(hass, DOMAIN)).get_component()
+        capacity = (
+            component.governor.DEFAULT_CAPACITY
+            + (fake.ata_count + fake.atw_count) * BUDGET_PER_DEVICE
+        )
+        try:
+            with patch.object(
+                component,
+                "RequestGovernor",
+                partial(component.RequestGovernor, capacity=capacity),
+            ):
+                if setup:
+                    await async_setup_entry(environment)
+                yield environment
+        finally:
+            await hass.async_stop(force=True)
+            await fake.stop()
+
+
+async def async_setup_entry(environment: BenchmarkEnvironment) -> None:
+    """Add the config entry and wait for its platforms to settle.
+
+    Raises BenchmarkError unless every device got ready with its entities.
+    """
+    await environment.hass.config_entries.async_add(environment.entry)
+    await environment.hass.async_block_till_done()
+    environment.check_ready()
@@ -2,31 +2,170 @@
 from __future__ import annotations
 
 import asyncio
-from datetime import timedelta
+from collections.abc import Callable, Iterable
+from datetime import datetime, timedelta
+from http import HTTPStatus
 import logging
-from typing import Any
+import time
+from typing import Any, TypeVar
 
-from aiohttp import ClientConnectionError
+from aiohttp import ClientConnectionError, ClientError, ClientResponseError
 from async_timeout import timeout
-from pymelcloud import Device, get_devices
+from pymelcloud import DEVICE_TYPE_ATA, DEVICE_TYPE_ATW, Device, get_devices
+from pymelcloud.atw_device import Zone
+from pymelcloud.client import Client
+from pymelcloud.const import ACCESS_LEVEL
+from pymelcloud.device import PROPERTY_POWER
 import voluptuous as vol
 
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
 from homeassistant.const import CONF_TOKEN, CONF_USERNAME, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import (
+    ConfigEntryAuthFailed,
+    ConfigEntryNotReady,
+    HomeAssistantError,
+)
+from homeassistant.helpers import entity_registry as er
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.device_registry import CONNECTION_NETWORK_MAC
+from homeassistant.helpers.device_registry import (
+    CONNECTION_NETWORK_MAC,
+    async_entries_for_config_entry,
+    async_get as async_get_device_registry,
+)
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.typing import ConfigType
-from homeassistant.util import Throttle
+import homeassistant.util.dt as dt_util
 
-from .const import DOMAIN
+from .auth import TokenManager
+from .const import (
+    CONF_CONFIGURATION_REFRESH_INTERVAL,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_MAX_POLL_INTERVAL,
+    CONF_POLL_INTERVAL,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SETUP_TIMEOUT,
+    CONF_WRITE_WINDOW,
+    DOMAIN,
+)
+from .coordinator import MelCloudDataUpdateCoordinator
+from .energy import EnergyHistoryImporter, async_remove_progress
+from .governor import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_REQUEST_TIMEOUT,
+    CircuitOpen,
+    RequestDeferred,
+    RequestGovernor,
+    RequestPriority,
+)
+from .history import SampleHistory, Trend
+from .metrics import AtwMetrics
+from .scheduler import MAX_POLL_INTERVAL, POLL_INTERVAL
+from .services import async_setup_services
+from .session import async_get_session
+from .snapshot import DeviceSnapshotStore
 
 _LOGGER = logging.getLogger(__name__)
 
-MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=60)
+_T = TypeVar("_T")
+
+# Device configurations come from the listing shared by the devices of a
+# building and are refreshed once they are older than this and in use.
+CONF_UPDATE_INTERVAL = timedelta(minutes=5)
+# Writes are coalesced by MelCloudDevice.async_set instead.
+DEVICE_SET_DEBOUNCE = timedelta(0)
+ENERGY_REPORT_INTERVAL = timedelta(minutes=10)
+WRITE_WINDOW = timedelta(milliseconds=500)
+# Written values are shown until the device confirms them, at most this long.
+PENDING_TIMEOUT = timedelta(minutes=3)
+
+# Fetching the devices of an account takes longer the more devices it has.
+FETCH_TIMEOUT = 10
+FETCH_TIMEOUT_PER_DEVICE = 0.2
+MAX_FETCH_TIMEOUT = 60
+
+# Options of a config entry that does not set them.
+DEFAULT_OPTIONS: dict[str, int] = {
+    CONF_POLL_INTERVAL: int(POLL_INTERVAL.total_seconds()),
+    CONF_MAX_POLL_INTERVAL: int(MAX_POLL_INTERVAL.total_seconds()),
+    CONF_WRITE_WINDOW: int(WRITE_WINDOW / timedelta(milliseconds=1)),
+    CONF_CONFIGURATION_REFRESH_INTERVAL: int(CONF_UPDATE_INTERVAL.total_seconds()),
+    CONF_MAX_CONCURRENT_REQUESTS: DEFAULT_CONCURRENCY,
+    CONF_REQUEST_TIMEOUT: DEFAULT_REQUEST_TIMEOUT,
+    CONF_SETUP_TIMEOUT: FETCH_TIMEOUT,
+}
+
+# Suffix of the unique IDs of second zone sensors. Older versions appended it
+# once more for every zone sensor created before, in any zone.
+ZONE_2_SUFFIX = "-zone-2"
+
+# Devices fetched by the config flow wait this many seconds for the setup of
+# the new entry.
+DATA_HANDOFF = f"{DOMAIN}_handoff"
+HANDOFF_TTL = 60
+
+# Pseudo fields reported by MelCloudDevice.has_changed next to the state and
+# configuration keys.
+DEVICE_UNITS_FIELD = "DeviceUnits"
+ENERGY_REPORT_FIELD = "EnergyReport"
+LAST_REFRESH_FIELD = "LastRefresh"
+METRICS_FIELD = "Metrics"
+HISTORY_FIELD = "History"
+PENDING_FIELD = "Pending"
+# Configuration fields mirrored by the Device/Get state, keyed by their name in
+# the configuration. A change of the state disagreeing with the configuration
+# hints that the configuration changed.
+CONF_HINT_KEYS = {
+    "DeviceName": "Name",
+    "HideVaneControls": "HideVaneControls",
+    "HideDryModeControl": "HideDryModeControl",
+}
+# Fields the device registry entry is derived from.
+DEVICE_INFO_FIELDS = frozenset({DEVICE_UNITS_FIELD, "MacAddress", "SerialNumber"})
+NO_FIELDS: frozenset[str] = frozenset()
+ZONE_FIELDS = frozenset({"HasThermostatZone1", "HasZone2", "HasThermostatZone2"})
+
+# ListDevices entries carry most of the device state under "Device", partially
+# under different names than the state returned by Device/Get.
+LISTING_STATE_KEYS: dict[str, dict[str, str]] = {
+    DEVICE_TYPE_ATA: {
+        "Power": "Power",
+        "OperationMode": "OperationMode",
+        "RoomTemperature": "RoomTemperature",
+        "SetTemperature": "SetTemperature",
+        "NumberOfFanSpeeds": "NumberOfFanSpeeds",
+        "FanSpeed": "SetFanSpeed",
+        "VaneHorizontalDirection": "VaneHorizontal",
+        "VaneVerticalDirection": "VaneVertical",
+        "Offline": "Offline",
+    },
+    DEVICE_TYPE_ATW: {
+        "Power": "Power",
+        "OperationMode": "OperationMode",
+        "TankWaterTemperature": "TankWaterTemperature",
+        "SetTankWaterTemperature": "SetTankWaterTemperature",
+        "OutdoorTemperature": "OutdoorTemperature",
+        "ForcedHotWaterMode": "ForcedHotWaterMode",
+        "HolidayMode": "HolidayMode",
+        "RoomTemperatureZone1": "RoomTemperatureZone1",
+        "RoomTemperatureZone2": "RoomTemperatureZone2",
+        "SetTemperatureZone1": "SetTemperatureZone1",
+        "SetTemperatureZone2": "SetTemperatureZone2",
+        "OperationModeZone1": "OperationModeZone1",
+        "OperationModeZone2": "OperationModeZone2",
+        "IdleZone1": "IdleZone1",
+        "IdleZone2": "IdleZone2",
+        "ProhibitZone1": "ProhibitZone1",
+        "ProhibitZone2": "ProhibitZone2",
+        "Offline": "Offline",
+    },
+}
+
+# State fields whose recent history is kept for trends.
+HISTORY_KEYS: dict[str, tuple[str, ...]] = {
+    DEVICE_TYPE_ATA: ("RoomTemperature",),
+    DEVICE_TYPE_ATW: ("RoomTemperatureZone1", "RoomTemperatureZone2"),
+}
 
 PLATFORMS = [Platform.CLIMATE, Platform.SENSOR, Platform.WATER_HEATER]
 
@@ -49,6 +188,7 @@ CONFIG_SCHEMA = vol.Schema(
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Establish connection with MELCloud."""
+    async_setup_services(hass)
     if DOMAIN not in config:
         return True
 
@@ -66,13 +206,58 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Establish connection with MELClooud."""
-    conf = entry.data
-    mel_devices = await mel_devices_setup(hass, conf[CONF_TOKEN])
-    hass.data.setdefault(DOMAIN, {}).update({entry.entry_id: mel_devices})
+    governor = RequestGovernor()
+    token_manager = TokenManager(hass, entry, governor)
+    token = await token_manager.async_get_token()
+    snapshots = DeviceSnapshotStore(hass, entry.entry_id)
+    client = Client(
+        token,
+        async_get_session(hass),
+        conf_update_interval=CONF_UPDATE_INTERVAL,
+        device_set_debounce=DEVICE_SET_DEBOUNCE,
+    )
+    if (cached_devices := await snapshots.async_load_devices(client)) is not None:
+        mel_devices = wrap_devices(cached_devices, governor, stale=True)
+    else:
+        device_registry = async_get_device_registry(hass)
+        mel_devices = await mel_devices_setup(
+            hass,
+            token,
+            governor,
+            len(async_entries_for_config_entry(device_registry, entry.entry_id))
+            or None,
+            entry.options.get(CONF_SETUP_TIMEOUT, FETCH_TIMEOUT),
+        )
+    _async_migrate_zone_unique_ids(hass, entry)
+    coordinator = MelCloudDataUpdateCoordinator(hass, mel_devices, governor, snapshots)
+    coordinator.async_apply_options(entry.options)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
+    entry.async_on_unload(token_manager.async_start(coordinator))
+    if cached_devices is not None:
+        # Entities are built from the last snapshot and reconciled once the
+        # first refresh has fetched the live state in the background.
+        entry.async_create_background_task(
+            hass, coordinator.async_refresh(), f"{DOMAIN} {entry.title} refresh"
+        )
+    else:
+        await coordinator.async_config_entry_first_refresh()
+    hass.data.setdefault(DOMAIN, {}).update({entry.entry_id: coordinator})
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+
+    if "recorder" in hass.config.components:
+        importer = EnergyHistoryImporter(hass, entry.entry_id, governor)
+        entry.async_on_unload(importer.async_start(entry, coordinator))
+    for mel_device in coordinator.devices:
+        entry.async_on_unload(mel_device.async_cancel_writes)
     return True
 
 
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options without reloading the entities."""
+    coordinator: MelCloudDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator.async_apply_options(entry.options)
+
+
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     unload_ok = await hass.config_entries.async_unload_platforms(
@@ -84,39 +269,631 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored data of a removed config entry."""
+    await DeviceSnapshotStore(hass, entry.entry_id).async_remove()
+    await async_remove_progress(hass, entry.entry_id)
+
+
+@callback
+def _async_migrate_zone_unique_ids(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Give zone sensors with repeated zone suffixes their current unique IDs.
+
+    Of the sensors of a device sharing a unique ID up to the suffixes, the one
+    with fewer suffixes belongs to the first zone and gets none, the other one
+    belongs to the second zone and gets a single suffix.
+    """
+    entity_registry = er.async_get(hass)
+    sensors: dict[str, list[er.RegistryEntry]] = {}
+    for registry_entry in er.async_entries_for_config_entry(
+        entity_registry, entry.entry_id
+    ):
+        if registry_entry.domain != Platform.SENSOR:
+            continue
+        base = registry_entry.unique_id
+        while base.endswith(ZONE_2_SUFFIX):
+            base = base.removesuffix(ZONE_2_SUFFIX)
+        sensors.setdefault(base, []).append(registry_entry)
+
+    for base, registry_entries in sensors.items():
+        registry_entries.sort(key=lambda registry_entry: len(registry_entry.unique_id))
+        for unique_id, registry_entry in zip(
+            (base, f"{base}{ZONE_2_SUFFIX}"), registry_entries
+        ):
+            if registry_entry.unique_id == unique_id or (
+                entity_registry.async_get_entity_id(Platform.SENSOR, DOMAIN, unique_id)
+                is not None
+            ):
+                continue
+            _LOGGER.debug(
+                "Migrating unique ID of %s to %s", registry_entry.entity_id, unique_id
+            )
+            entity_registry.async_update_entity(
+                registry_entry.entity_id, new_unique_id=unique_id
+            )
+
+
 class MelCloudDevice:
     """MELCloud Device instance."""
 
-    def __init__(self, device: Device) -> None:
+    # Large accounts keep thousands of devices, spare them an attribute dict.
+    __slots__ = (
+        "device",
+        "governor",
+        "name",
+        "write_window",
+        "conf_update_interval",
+        "_available",
+        "_changed_fields",
+        "_capabilities",
+        "_capability_keys",
+        "stale",
+        "last_write",
+        "last_refresh",
+        "_write_listeners",
+        "_conf_listeners",
+        "_conf_expires",
+        "_state_listeners",
+        "_unconfirmed",
+        "_unsent",
+        "_energy_report_updated",
+        "_history",
+        "metrics",
+        "_pending_writes",
+        "_write_future",
+        "_write_task",
+        "_write_lock",
+    )
+
+    def __init__(
+        self,
+        device: Device,
+        governor: RequestGovernor,
+        write_window: timedelta = WRITE_WINDOW,
+    ) -> None:
         """Construct a device wrapper."""
         self.device = device
+        self.governor = governor
         self.name = device.name
+        self.write_window = write_window
+        self.conf_update_interval = CONF_UPDATE_INTERVAL
         self._available = True
+        # Fields changed since listeners were last notified, None if all did.
+        self._changed_fields: set[str] | None = None
+        self._capabilities: dict[str, Any] = {}
+        self._capability_keys: dict[str, set[str]] = {}
+        self.stale = False
+        self.last_write: datetime | None = None
+        self.last_refresh: datetime | None = None
+        self._write_listeners: list[Callable[[], None]] = []
+        self._conf_listeners: list[Callable[[MelCloudDevice], None]] = []
+        # Monotonic time the configuration is refreshed after, once it is used.
+        self._conf_expires = 0.0
+        self._extend_conf_expiry()
+        self._state_listeners: list[Callable[[], None]] = []
+        # Written state values waiting for confirmation by the device, with the
+        # values they replaced and when they were written.
+        self._unconfirmed: dict[str, tuple[Any, Any, datetime]] = {}
+        # State keys of writes that have not been sent yet. Replaced rather than
+        # updated, so idle devices share the empty set.
+        self._unsent = NO_FIELDS
+        self._energy_report_updated: datetime | None = None
+        self._history: dict[str, SampleHistory] = {}
+        # Derived metrics of heat pumps with energy meters.
+        self.metrics: AtwMetrics | None = None
+        # pylint: disable-next=protected-access
+        if device.device_type == DEVICE_TYPE_ATW and AtwMetrics.supported(
+            device._device_conf
+        ):
+            self.metrics = AtwMetrics()
+            self.metrics.update(device._device_conf, time.monotonic())
+        self._pending_writes: dict[str, Any] = {}
+        self._write_future: asyncio.Future[None] | None = None
+        self._write_task: asyncio.Task[None] | None = None
+        self._write_lock = asyncio.Lock()
+
+    async def async_update(
+        self, priority: RequestPriority = RequestPriority.BACKGROUND
+    ) -> bool:
+        """Pull the latest data from MELCloud.
+
+        Returns False if the update was deferred by the request governor.
+        """
+        # State and energy report, plus the units on the first update.
+        cost = 2 if self.device.units is not None else 3
+        # pylint: disable=protected-access
+        state = self.device._state
+        energy_report = self.device._energy_report
+        units = self.device._device_units
+        try:
+            await self.governor.async_request(
+                self._async_fetch,
+                operation="update",
+                cost=cost,
+                priority=priority,
+                idempotent=True,
+            )
+            self.available = True
+            self.stale = False
+            self.last_refresh = self._energy_report_updated = dt_util.utcnow()
+        except CircuitOpen:
+            self.available = False
+            return False
+        except RequestDeferred:
+            return False
+        except (ClientError, asyncio.TimeoutError) as ex:
+            _LOGGER.warning("Update failed for %s: %s", self.name, ex)
+            self.available = False
+            return True
+
+        if self.device._state is not None:
+            self._reconcile(self.device._state, self.device._state.keys())
+        self._record_changes({LAST_REFRESH_FIELD})
+        changed = _changed_keys(state, self.device._state)
+        self._record_changes(changed)
+        self._record_history()
+        if _conf_hinted(self.device._device_conf, self.device._state, changed):
+            self._async_expire_conf()
+        if energy_report != self.device._energy_report:
+            self._record_changes({ENERGY_REPORT_FIELD})
+        if units != self.device._device_units:
+            self._record_changes({DEVICE_UNITS_FIELD})
+        return True
+
+    async def _async_fetch(self) -> None:
+        """Fetch the state and energy report, and the units on the first update.
+
+        Unlike Device.update, the configuration is left to the listing shared by
+        the devices of the building.
+        """
+        # pylint: disable=protected-access
+        client = self.device._client
+        self.device._state = await client.fetch_device_state(self.device)
+        self.device._energy_report = await client.fetch_energy_report(self.device)
+        if self.device._device_units is None and self.device.access_level != (
+            ACCESS_LEVEL["GUEST"]
+        ):
+            self.device._device_units = await client.fetch_device_units(self.device)
+
+    def apply_listing(self, conf: dict[str, Any]) -> bool:
+        """Apply a ListDevices entry to the device.
+
+        Returns False if the entry lacks state fields the device depends on and a
+        per-device update is required instead.
+        """
+        # pylint: disable=protected-access
+        self._record_changes(_changed_conf_keys(self.device._device_conf, conf))
+        self.device._device_conf = conf
+        self._extend_conf_expiry()
+        if self.metrics is not None and self.metrics.update(conf, time.monotonic()):
+            self._record_changes({METRICS_FIELD})
+        if (state := self.device._state) is None:
+            return False
+
+        listed = conf.get("Device", {})
+        changes = {}
+        for listing_key, state_key in LISTING_STATE_KEYS.get(
+            self.device.device_type, {}
+        ).items():
+            if state_key not in state:
+                continue
+            if listing_key not in listed:
+                return False
+            changes[state_key] = listed[listing_key]
+
+        self._reconcile(changes, changes.keys())
+        self._record_changes(
+            {key for key, value in changes.items() if state.get(key) != value}
+        )
+        self.device._state = {**state, **changes}
+        self._record_history()
+        self.available = True
+        self.stale = False
+        self.last_refresh = dt_util.utcnow()
+        self._record_changes({LAST_REFRESH_FIELD})
+        return True
+
+    def _record_history(self) -> None:
+        """Add the refreshed values of the HISTORY_KEYS to their histories."""
+        # pylint: disable-next=protected-access
+        if (state := self.device._state) is None:
+            return
+        now = time.monotonic()
+        added = False
+        for key in HISTORY_KEYS.get(self.device.device_type, ()):
+            if (value := state.get(key)) is None:
+                continue
+            if (history := self._history.get(key)) is None:
+                history = self._history[key] = SampleHistory()
+            added |= history.add(now, value)
+        if added:
+            self._record_changes({HISTORY_FIELD})
+
+    def trend(self, key: str, target_key: str) -> Trend:
+        """Return the recent development of a state field towards its target."""
+
+        def _compute() -> Trend:
+            if (history := self._history.get(key)) is None:
+                return Trend()
+            # pylint: disable-next=protected-access
+            return history.trend((self.device._state or {}).get(target_key))
+
+        return self.capability(f"trend_{key}", (HISTORY_FIELD, target_key), _compute)
+
+    def _record_changes(self, fields: set[str]) -> None:
+        """Remember changed fields until listeners are notified.
+
+        Capabilities derived from the fields are dropped.
+        """
+        if self._capability_keys:
+            for field in fields & self._capability_keys.keys():
+                for key in self._capability_keys.pop(field):
+                    self._capabilities.pop(key, None)
+        if self._changed_fields is not None:
+            self._changed_fields |= fields
+
+    def capability(
+        self, key: str, fields: Iterable[str], compute: Callable[[], _T]
+    ) -> _T:
+        """Return a value derived from the device, computed once.
+
+        The value is computed again only after one of the fields it is derived
+        from has changed. Callers must not modify the returned value.
+        """
+        try:
+            return self._capabilities[key]
+        except KeyError:
+            pass
+        value = self._capabilities[key] = compute()
+        for field in fields:
+            self._capability_keys.setdefault(field, set()).add(key)
+        return value
+
+    def has_changed(self, fields: Iterable[str] | None = None) -> bool:
+        """Return True if any of the fields changed since the last notification.
+
+        Availability changes and refreshes are reported for every field. Without
+        fields, any change of the device is reported.
+        """
+        if self._changed_fields is None:
+            return True
+        if fields is None:
+            return bool(self._changed_fields)
+        return not self._changed_fields.isdisjoint(fields)
+
+    @property
+    def conf_expired(self) -> bool:
+        """Return True once the configuration is older than conf_update_interval."""
+        return time.monotonic() >= self._conf_expires
+
+    def _extend_conf_expiry(self) -> None:
+        """Keep the configuration for another conf_update_interval."""
+        self._conf_expires = (
+            time.monotonic() + self.conf_update_interval.total_seconds()
+        )
+
+    @callback
+    def _async_expire_conf(self) -> None:
+        """Ask the conf listeners to refresh the configuration.
+
+        Requests are not repeated within conf_update_interval if the refresh
+        fails.
+        """
+        self._extend_conf_expiry()
+        for conf_listener in list(self._conf_listeners):
+            conf_listener(self)
+
+    @callback
+    def async_add_conf_listener(
+        self, conf_listener: Callable[[MelCloudDevice], None]
+    ) -> CALLBACK_TYPE:
+        """Listen for the configuration of the device to need a refresh."""
+        self._conf_listeners.append(conf_listener)
+
+        @callback
+        def remove_conf_listener() -> None:
+            self._conf_listeners.remove(conf_listener)
+
+        return remove_conf_listener
+
+    @callback
+    def async_clear_changes(self) -> None:
+        """Forget the changes after listeners have been notified."""
+        self._changed_fields = set()
 
-    @Throttle(MIN_TIME_BETWEEN_UPDATES)
-    async def async_update(self, **kwargs):
-        """Pull the latest data from MELCloud."""
+    async def async_update_energy_report(self) -> None:
+        """Refresh the energy report if it is older than ENERGY_REPORT_INTERVAL.
+
+        The report is not part of the ListDevices payload and has to be fetched
+        per device.
+        """
+        now = dt_util.utcnow()
+        if (
+            self._energy_report_updated is not None
+            and now - self._energy_report_updated < ENERGY_REPORT_INTERVAL
+        ):
+            return
+
+        # pylint: disable=protected-access
+        try:
+            energy_report = await self.governor.async_request(
+                lambda: self.device._client.fetch_energy_report(self.device),
+                operation="energy_report",
+                idempotent=True,
+            )
+            if energy_report != self.device._energy_report:
+                self._record_changes({ENERGY_REPORT_FIELD})
+            self.device._energy_report = energy_report
+            self._energy_report_updated = now
+        except RequestDeferred:
+            pass
+        except (ClientError, asyncio.TimeoutError):
+            _LOGGER.warning("Energy report update failed for %s", self.name)
+
+    async def async_set(self, properties: dict[str, Any]) -> None:
+        """Write state changes to the MELCloud API.
+
+        The written values are shown right away and kept until a refresh
+        confirms them. Writes issued within write_window of each other are
+        merged into a single request. Every caller waits for the shared result.
+        Raises CircuitOpen right away while MELCloud is unreachable and
+        HomeAssistantError for devices whose state has not been fetched yet.
+        """
+        if not self.ready:
+            raise HomeAssistantError("Device is not available")
+        self.governor.breaker.check()
+        expected: dict[str, Any] = {}
+        for key, value in properties.items():
+            if key == PROPERTY_POWER:
+                expected["Power"] = value
+            else:
+                self.device.apply_write(expected, key, value)
+        expected.pop("EffectiveFlags", None)
+        self._apply_unconfirmed(expected)
+
+        self._pending_writes.update(properties)
+        if self._write_future is None:
+            loop = asyncio.get_running_loop()
+            self._write_future = loop.create_future()
+            self._write_task = loop.create_task(self._async_flush_writes())
+        await asyncio.shield(self._write_future)
+
+    @callback
+    def async_cancel_writes(self) -> None:
+        """Cancel the pending and running writes, failing their callers."""
+        if self._write_task is not None:
+            self._write_task.cancel()
+            self._write_task = None
+        self._pending_writes = {}
+        self._unsent = NO_FIELDS
+        if (future := self._write_future) is not None:
+            self._write_future = None
+            future.set_exception(HomeAssistantError("Write cancelled"))
+
+    async def _async_flush_writes(self) -> None:
+        """Send the merged pending writes once the write window has passed."""
+        await asyncio.sleep(self.write_window.total_seconds())
+        async with self._write_lock:
+            properties, self._pending_writes = self._pending_writes, {}
+            future, self._write_future = self._write_future, None
+            sent, self._unsent = self._unsent, NO_FIELDS
+            assert future is not None
+            # pylint: disable=protected-access
+            state = self.device._state
+            expected = {
+                key: self._unconfirmed[key][0]
+                for key in sent
+                if key in self._unconfirmed
+            }
+            try:
+                await self._async_send_write(properties, expected)
+                # The response echoes the request, the device has yet to take it.
+                for key, (value, _, _) in self._unconfirmed.items():
+                    self.device._state[key] = value
+                self._record_changes(_changed_keys(state, self.device._state))
+                self.available = True
+                self.last_write = dt_util.utcnow()
+                for write_listener in list(self._write_listeners):
+                    write_listener()
+            except (ClientConnectionError, asyncio.TimeoutError):
+                _LOGGER.warning("Connection failed for %s", self.name)
+                self._roll_back(sent, "connection failed")
+                self.available = False
+                future.set_exception(
+                    HomeAssistantError(f"Connection failed for {self.name}")
+                )
+                return
+            except asyncio.CancelledError:
+                future.set_exception(HomeAssistantError("Write cancelled"))
+                raise
+            except Exception as ex:  # pylint: disable=broad-except
+                self._roll_back(sent, str(ex))
+                future.set_exception(ex)
+                return
+            future.set_result(None)
+
+    async def _async_send_write(
+        self, properties: dict[str, Any], expected: dict[str, Any]
+    ) -> None:
+        """Send properties to MELCloud, retrying once if the write got lost.
+
+        A write failing with a connection error, timeout or server error may
+        still have reached MELCloud. The device state is read back first and
+        the write is only sent again if the state lacks the expected values.
+        The error of the write is raised if the state cannot be read back.
+        """
         try:
-            await self.device.update()
-            self._available = True
-        except ClientConnectionError:
-            _LOGGER.warning("Connection failed for %s", self.name)
-            self._available = False
-
-    async def async_set(self, properties: dict[str, Any]):
-        """Write state changes to the MELCloud API."""
+            await self.governor.async_request(
+                lambda: self._async_write(properties),
+                operation="set",
+                priority=RequestPriority.WRITE,
+            )
+            return
+        except (ClientError, asyncio.TimeoutError) as ex:
+            if not self.governor.retryable(ex):
+                raise
+            _LOGGER.debug("Write to %s failed, checking its state: %s", self.name, ex)
+            write_error = ex
+
+        # pylint: disable=protected-access
         try:
-            await self.device.set(properties)
-            self._available = True
-        except ClientConnectionError:
-            _LOGGER.warning("Connection failed for %s", self.name)
-            self._available = False
+            state = await self.governor.async_request(
+                lambda: self.device._client.fetch_device_state(self.device),
+                operation="write_check",
+                priority=RequestPriority.WRITE,
+                idempotent=True,
+            )
+        except (HomeAssistantError, ClientError, asyncio.TimeoutError) as ex:
+            raise write_error from ex
+        if all(state.get(key) == value for key, value in expected.items()):
+            self.device._state = state
+            return
+        await self.governor.async_request(
+            lambda: self._async_write(properties),
+            operation="set",
+            priority=RequestPriority.WRITE,
+        )
+
+    async def _async_write(self, properties: dict[str, Any]) -> None:
+        """Send properties to MELCloud and apply the returned state.
+
+        Device.set is bypassed as it never returns if the request fails.
+        """
+        # pylint: disable=protected-access
+        state = self.device._state.copy()
+        for key, value in properties.items():
+            if key == PROPERTY_POWER:
+                state["Power"] = value
+                state["EffectiveFlags"] = state.get("EffectiveFlags", 0) | 0x01
+            else:
+                self.device.apply_write(state, key, value)
+        if state.get("EffectiveFlags", 0) != 0:
+            state["HasPendingCommand"] = True
+        self.device._state = await self.device._client.set_device_state(state)
+
+    @property
+    def pending(self) -> bool:
+        """Return True while written values wait for confirmation by the device."""
+        return bool(self._unconfirmed)
+
+    def _apply_unconfirmed(self, expected: dict[str, Any]) -> None:
+        """Show written state values until the device confirms them."""
+        # pylint: disable=protected-access
+        if not expected or (state := self.device._state) is None:
+            return
+        now = dt_util.utcnow()
+        for key, value in expected.items():
+            previous = (
+                self._unconfirmed[key][1]
+                if key in self._unconfirmed
+                else state.get(key)
+            )
+            self._unconfirmed[key] = (value, previous, now)
+        self._unsent = self._unsent.union(expected)
+        self.device._state = {**state, **expected}
+        self._record_changes(_changed_keys(state, self.device._state))
+        self._record_changes({PENDING_FIELD})
+        for state_listener in list(self._state_listeners):
+            state_listener()
+
+    def _reconcile(self, state: dict[str, Any], refreshed: Iterable[str]) -> None:
+        """Check refreshed state values against unconfirmed writes.
+
+        Values the device reports are confirmed. Until then the written values
+        are kept over the refreshed ones. They are rolled back to the reported
+        values once the device has processed its commands without taking them,
+        or after PENDING_TIMEOUT. Refreshes that do not report pending commands,
+        such as ListDevices entries, count as processed.
+        """
+        if not self._unconfirmed:
+            return
+        now = dt_util.utcnow()
+        # Refreshes racing a write may not include it yet.
+        writing = self._write_future is not None or self._write_lock.locked()
+        for key in self._unconfirmed.keys() & set(refreshed):
+            value, _, written = self._unconfirmed[key]
+            if state.get(key) == value:
+                del self._unconfirmed[key]
+            elif writing or (
+                now - written < PENDING_TIMEOUT
+                and state.get("HasPendingCommand", False) is True
+            ):
+                state[key] = value
+            else:
+                _LOGGER.warning(
+                    "%s did not take %s %s, rolling back to %s",
+                    self.name,
+                    key,
+                    value,
+                    state.get(key),
+                )
+                del self._unconfirmed[key]
+        if not self._unconfirmed:
+            self._record_changes({PENDING_FIELD})
+
+    def _roll_back(self, keys: Iterable[str], reason: str) -> None:
+        """Restore the state values replaced by writes that failed."""
+        # pylint: disable=protected-access
+        if (state := self.device._state) is None:
+            return
+        restored = {
+            key: self._unconfirmed.pop(key)[1]
+            for key in keys
+            if key in self._unconfirmed and key not in self._unsent
+        }
+        if not restored:
+            return
+        _LOGGER.warning(
+            "Rolling back %s of %s: %s", ", ".join(restored), self.name, reason
+        )
+        self.device._state = {**state, **restored}
+        self._record_changes(set(restored) | {PENDING_FIELD})
+        for state_listener in list(self._state_listeners):
+            state_listener()
+
+    @callback
+    def async_add_state_listener(
+        self, state_listener: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Listen for state changes made locally rather than by a refresh."""
+        self._state_listeners.append(state_listener)
+
+        @callback
+        def remove_state_listener() -> None:
+            self._state_listeners.remove(state_listener)
+
+        return remove_state_listener
+
+    @callback
+    def async_add_write_listener(
+        self, write_listener: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Listen for successful writes to the device."""
+        self._write_listeners.append(write_listener)
+
+        @callback
+        def remove_write_listener() -> None:
+            self._write_listeners.remove(write_listener)
+
+        return remove_write_listener
+
+    @property
+    def ready(self) -> bool:
+        """Return True once the state of the device has been fetched."""
+        return self.device._state is not None  # pylint: disable=protected-access
 
     @property
     def available(self) -> bool:
         """Return True if entity is available."""
         return self._available
 
+    @available.setter
+    def available(self, available: bool) -> None:
+        """Set the availability, marking every field changed if it flips."""
+        if available != self._available:
+            self._changed_fields = None
+        self._available = available
+
     @property
     def device_id(self):
         """Return device ID."""
@@ -130,6 +907,15 @@ class MelCloudDevice:
     @property
     def device_info(self) -> DeviceInfo:
         """Return a device description for device registry."""
+        return self.capability("device_info", DEVICE_INFO_FIELDS, self._device_info)
+
+    @property
+    def zones(self) -> list[Zone]:
+        """Return the zones of an Air-to-Water device, shared by its entities."""
+        return self.capability("zones", ZONE_FIELDS, lambda: self.device.zones or [])
+
+    def _device_info(self) -> DeviceInfo:
+        """Build the device description for device registry."""
         model = None
         if (unit_infos := self.device.units) is not None:
             model = ", ".join([x["model"] for x in unit_infos if x["model"]])
@@ -147,21 +933,134 @@ class MelCloudDevice:
         return self.device.daily_energy_consumed
 
 
-async def mel_devices_setup(hass, token) -> dict[str, list[MelCloudDevice]]:
-    """Query connected devices from MELCloud."""
-    session = async_get_clientsession(hass)
+def _changed_keys(old: dict[str, Any] | None, new: dict[str, Any] | None) -> set[str]:
+    """Return the keys whose values differ between two dicts."""
+    if old is None or new is None:
+        return set(old or ()) | set(new or ())
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+def _changed_conf_keys(
+    old: dict[str, Any] | None, new: dict[str, Any] | None
+) -> set[str]:
+    """Return the changed keys of a device configuration and its Device entry."""
+    return _changed_keys(old, new) | _changed_keys(
+        (old or {}).get("Device"), (new or {}).get("Device")
+    )
+
+
+def _conf_hinted(
+    conf: dict[str, Any] | None, state: dict[str, Any] | None, changed: set[str]
+) -> bool:
+    """Return True if changed state fields disagree with the configuration."""
+    if conf is None or state is None:
+        return False
+    return any(
+        state_key in changed
+        and state_key in state
+        and state[state_key] != conf.get(key)
+        for key, state_key in CONF_HINT_KEYS.items()
+    )
+
+
+def fetch_timeout(device_count: int | None, base: float = FETCH_TIMEOUT) -> float:
+    """Return the timeout of fetching the devices of an account.
+
+    Accounts of unknown size get the longest timeout.
+    """
+    longest = max(base, MAX_FETCH_TIMEOUT)
+    if device_count is None:
+        return longest
+    return min(base + FETCH_TIMEOUT_PER_DEVICE * device_count, longest)
+
+
+async def async_fetch_devices(
+    hass: HomeAssistant,
+    token: str,
+    device_count: int | None = None,
+    base_timeout: float = FETCH_TIMEOUT,
+) -> dict[str, list[Device]]:
+    """Fetch the devices of an account, waiting longer for larger accounts."""
+    async with timeout(fetch_timeout(device_count, base_timeout)):
+        return await get_devices(
+            token,
+            async_get_session(hass),
+            conf_update_interval=CONF_UPDATE_INTERVAL,
+            device_set_debounce=DEVICE_SET_DEBOUNCE,
+        )
+
+
+@callback
+def async_hand_off_devices(
+    hass: HomeAssistant, token: str, devices: dict[str, list[Device]]
+) -> None:
+    """Keep devices fetched by the config flow for the setup of the new entry."""
+    handoff: dict[str, tuple[dict[str, list[Device]], float]] = hass.data.setdefault(
+        DATA_HANDOFF, {}
+    )
+    now = time.monotonic()
+    for stale_token in [key for key, (_, expires) in handoff.items() if expires < now]:
+        del handoff[stale_token]
+    handoff[token] = (devices, now + HANDOFF_TTL)
+
+
+@callback
+def _async_take_handed_off_devices(
+    hass: HomeAssistant, token: str
+) -> dict[str, list[Device]] | None:
+    """Return the devices the config flow fetched with the token, if recent."""
+    handoff = hass.data.get(DATA_HANDOFF, {})
+    if (handed_off := handoff.pop(token, None)) is None:
+        return None
+    if not handoff:
+        hass.data.pop(DATA_HANDOFF)
+    devices, expires = handed_off
+    return devices if time.monotonic() <= expires else None
+
+
+async def mel_devices_setup(
+    hass: HomeAssistant,
+    token: str,
+    governor: RequestGovernor,
+    device_count: int | None = None,
+    base_timeout: float = FETCH_TIMEOUT,
+) -> dict[str, list[MelCloudDevice]]:
+    """Query connected devices from MELCloud.
+
+    Devices the config flow fetched right before are used instead.
+    """
+    if (all_devices := _async_take_handed_off_devices(hass, token)) is not None:
+        return wrap_devices(all_devices, governor)
+
     try:
-        async with timeout(10):
-            all_devices = await get_devices(
-                token,
-                session,
-                conf_update_interval=timedelta(minutes=5),
-                device_set_debounce=timedelta(seconds=1),
-            )
-    except (asyncio.TimeoutError, ClientConnectionError) as ex:
+        all_devices = await governor.async_request(
+            lambda: async_fetch_devices(hass, token, device_count, base_timeout),
+            operation="get_devices",
+            cost=2,
+            priority=RequestPriority.USER,
+            deadline=fetch_timeout(device_count, base_timeout),
+        )
+    except ClientResponseError as ex:
+        if ex.status == HTTPStatus.UNAUTHORIZED:
+            raise ConfigEntryAuthFailed("MELCloud rejected the token") from ex
         raise ConfigEntryNotReady() from ex
+    except (asyncio.TimeoutError, ClientConnectionError, RequestDeferred) as ex:
+        raise ConfigEntryNotReady() from ex
+
+    return wrap_devices(all_devices, governor)
+
 
+def wrap_devices(
+    all_devices: dict[str, list[Device]],
+    governor: RequestGovernor,
+    stale: bool = False,
+) -> dict[str, list[MelCloudDevice]]:
+    """Wrap pymelcloud devices grouped by device type."""
     wrapped_devices: dict[str, list[MelCloudDevice]] = {}
     for device_type, devices in all_devices.items():
-        wrapped_devices[device_type] = [MelCloudDevice(device) for device in devices]
+        wrapped_devices[device_type] = []
+        for device in devices:
+            mel_device = MelCloudDevice(device, governor)
+            mel_device.stale = stale
+            wrapped_devices[device_type].append(mel_device)
     return wrapped_devices
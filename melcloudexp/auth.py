@@ -0,0 +1,231 @@
+"""Token lifecycle of MELCloud accounts."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError
+from async_timeout import timeout
+import pymelcloud.client
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_TOKEN, CONF_USERNAME
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.exceptions import (
+    ConfigEntryAuthFailed,
+    ConfigEntryNotReady,
+    HomeAssistantError,
+)
+from homeassistant.helpers.event import async_call_later, async_track_point_in_utc_time
+import homeassistant.util.dt as dt_util
+
+from .const import CONF_TOKEN_EXPIRY, DOMAIN
+from .governor import RequestGovernor
+from .session import async_get_session
+
+if TYPE_CHECKING:
+    from .coordinator import MelCloudDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+LOGIN_TIMEOUT = 10
+# Tokens are renewed this long before they expire.
+RENEWAL_MARGIN = timedelta(days=7)
+RENEWAL_RETRY_DELAY = timedelta(minutes=5)
+
+
+class InvalidAuth(HomeAssistantError):
+    """MELCloud rejected the credentials."""
+
+
+async def async_login(
+    hass: HomeAssistant, username: str, password: str
+) -> tuple[str, datetime | None]:
+    """Log in to MELCloud and return the token and when it expires.
+
+    Raises InvalidAuth if the credentials are rejected.
+    """
+    async with timeout(LOGIN_TIMEOUT):
+        # pymelcloud.login drops the expiry of the token.
+        # pylint: disable-next=protected-access
+        response = await pymelcloud.client._do_login(
+            async_get_session(hass), username, password
+        )
+    if not (login_data := response.get("LoginData")):
+        raise InvalidAuth(f"MELCloud rejected the login: {response.get('ErrorId')}")
+
+    expiry = dt_util.parse_datetime(str(login_data.get("Expiry") or ""))
+    if expiry is not None and expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=dt_util.UTC)
+    return login_data["ContextKey"], expiry
+
+
+def token_data(token: str, expiry: datetime | None) -> dict[str, Any]:
+    """Return the config entry data describing a token."""
+    return {
+        CONF_TOKEN: token,
+        CONF_TOKEN_EXPIRY: None if expiry is None else expiry.isoformat(),
+    }
+
+
+class TokenManager:
+    """Keep the token of a config entry valid.
+
+    Tokens are renewed with the stored password ahead of their expiry and
+    whenever MELCloud rejects them. Without a stored password, or when the
+    password is rejected as well, requests stay suspended and the user is asked
+    to reauthenticate.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry: ConfigEntry, governor: RequestGovernor
+    ) -> None:
+        """Initialize the token manager."""
+        self.hass = hass
+        self.entry = entry
+        self.governor = governor
+        self._coordinator: MelCloudDataUpdateCoordinator | None = None
+        self._unsub_renewal: CALLBACK_TYPE | None = None
+        self._renewing = False
+
+    @property
+    def expiry(self) -> datetime | None:
+        """Return when the current token expires, if known."""
+        return dt_util.parse_datetime(self.entry.data.get(CONF_TOKEN_EXPIRY) or "")
+
+    async def async_get_token(self) -> str:
+        """Return the token, renewing it first if it is about to expire.
+
+        Raises ConfigEntryAuthFailed if the token expired and cannot be renewed
+        and ConfigEntryNotReady if MELCloud could not be reached to renew it.
+        """
+        now = dt_util.utcnow()
+        if (expiry := self.expiry) is None or now < expiry - RENEWAL_MARGIN:
+            return self.entry.data[CONF_TOKEN]
+
+        if CONF_PASSWORD in self.entry.data:
+            try:
+                await self._async_login()
+            except InvalidAuth as ex:
+                raise ConfigEntryAuthFailed(ex) from ex
+            except (asyncio.TimeoutError, ClientError) as ex:
+                if expiry <= now:
+                    raise ConfigEntryNotReady(ex) from ex
+        elif expiry <= now:
+            raise ConfigEntryAuthFailed("The MELCloud token has expired")
+        return self.entry.data[CONF_TOKEN]
+
+    @callback
+    def async_start(self, coordinator: MelCloudDataUpdateCoordinator) -> CALLBACK_TYPE:
+        """Keep the token valid until the returned callback is called."""
+        self._coordinator = coordinator
+        unsub_suspend = self.governor.async_add_suspend_listener(
+            self._async_handle_suspend
+        )
+        self._async_schedule_renewal(self.expiry)
+
+        @callback
+        def _async_stop() -> None:
+            unsub_suspend()
+            self._async_cancel_renewal()
+            self._coordinator = None
+
+        return _async_stop
+
+    @callback
+    def _async_cancel_renewal(self) -> None:
+        """Cancel the scheduled renewal."""
+        if self._unsub_renewal is not None:
+            self._unsub_renewal()
+            self._unsub_renewal = None
+
+    @callback
+    def _async_schedule_renewal(self, expiry: datetime | None) -> None:
+        """Renew the token RENEWAL_MARGIN before it expires."""
+        self._async_cancel_renewal()
+        if expiry is None:
+            return
+        self._unsub_renewal = async_track_point_in_utc_time(
+            self.hass,
+            self._async_handle_renewal_due,
+            max(expiry - RENEWAL_MARGIN, dt_util.utcnow()),
+        )
+
+    @callback
+    def _async_handle_renewal_due(self, now: datetime) -> None:
+        """Renew the token in the background."""
+        self._unsub_renewal = None
+        self._async_start_renewal()
+
+    @callback
+    def _async_handle_suspend(self) -> None:
+        """Renew the token MELCloud rejected."""
+        _LOGGER.warning(
+            "MELCloud rejected the token of %s, suspending requests", self.entry.title
+        )
+        self._async_start_renewal()
+
+    @callback
+    def _async_start_renewal(self) -> None:
+        """Start renewing the token unless a renewal is in progress."""
+        if self._renewing:
+            return
+        self._renewing = True
+        self.entry.async_create_background_task(
+            self.hass, self._async_renew(), f"{DOMAIN} {self.entry.title} token renewal"
+        )
+
+    async def _async_renew(self) -> None:
+        """Log in with the stored password or ask the user to reauthenticate."""
+        try:
+            if CONF_PASSWORD in self.entry.data:
+                try:
+                    expiry = await self._async_login()
+                except (asyncio.TimeoutError, ClientError) as ex:
+                    _LOGGER.warning(
+                        "Renewing the token of %s failed: %s", self.entry.title, ex
+                    )
+                    self._unsub_renewal = async_call_later(
+                        self.hass, RENEWAL_RETRY_DELAY, self._async_handle_renewal_due
+                    )
+                    return
+                except InvalidAuth as ex:
+                    _LOGGER.warning(
+                        "Renewing the token of %s failed: %s", self.entry.title, ex
+                    )
+                else:
+                    self.governor.async_resume()
+                    self._async_schedule_renewal(expiry)
+                    if self._coordinator is not None:
+                        await self._coordinator.async_refresh()
+                    return
+            self.entry.async_start_reauth(self.hass)
+        finally:
+            self._renewing = False
+
+    async def _async_login(self) -> datetime | None:
+        """Log in with the stored password and switch every device to the new token.
+
+        The login is made while requests are suspended, so it bypasses the
+        request budget but is recorded in the telemetry of the account.
+        """
+        token, expiry = await self.governor.telemetry.async_measure(
+            "login",
+            lambda: async_login(
+                self.hass,
+                self.entry.data[CONF_USERNAME],
+                self.entry.data[CONF_PASSWORD],
+            ),
+        )
+        self.hass.config_entries.async_update_entry(
+            self.entry, data={**self.entry.data, **token_data(token, expiry)}
+        )
+        if (
+            self._coordinator is not None
+            and (client := self._coordinator.client) is not None
+        ):
+            client._token = token  # pylint: disable=protected-access
+        _LOGGER.debug("Renewed the token of %s", self.entry.title)
+        return expiry
@@ -1,7 +1,6 @@
 """Platform for climate integration."""
 from __future__ import annotations
 
-from datetime import timedelta
 from typing import Any
 
 from pymelcloud import DEVICE_TYPE_ATA, DEVICE_TYPE_ATW, AtaDevice, AtwDevice
@@ -9,7 +8,9 @@ import pymelcloud.ata_device as ata
 import pymelcloud.atw_device as atw
 from pymelcloud.atw_device import (
     PROPERTY_ZONE_1_OPERATION_MODE,
+    PROPERTY_ZONE_1_TARGET_TEMPERATURE,
     PROPERTY_ZONE_2_OPERATION_MODE,
+    PROPERTY_ZONE_2_TARGET_TEMPERATURE,
     Zone,
 )
 import voluptuous as vol
@@ -24,13 +25,19 @@ from homeassistant.components.climate import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import ATTR_TEMPERATURE, TEMP_CELSIUS
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import config_validation as cv, entity_platform
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from . import MelCloudDevice
 from .const import (
+    ATTR_AVERAGE_TEMPERATURE,
+    ATTR_MINUTES_TO_TARGET,
+    ATTR_PENDING,
+    ATTR_STALE,
     ATTR_STATUS,
+    ATTR_TEMPERATURE_TREND,
     ATTR_VANE_HORIZONTAL,
     ATTR_VANE_HORIZONTAL_POSITIONS,
     ATTR_VANE_VERTICAL,
@@ -40,8 +47,10 @@ from .const import (
     SERVICE_SET_VANE_HORIZONTAL,
     SERVICE_SET_VANE_VERTICAL,
 )
+from .coordinator import DeviceContext, MelCloudDataUpdateCoordinator
+from .history import Trend
 
-SCAN_INTERVAL = timedelta(seconds=60)
+PARALLEL_UPDATES = 0
 
 
 ATA_HVAC_MODE_LOOKUP = {
@@ -54,6 +63,31 @@ ATA_HVAC_MODE_LOOKUP = {
 ATA_HVAC_MODE_REVERSE_LOOKUP = {v: k for k, v in ATA_HVAC_MODE_LOOKUP.items()}
 
 
+# Device fields the ATA capabilities are derived from.
+ATA_HVAC_MODE_FIELDS = frozenset({"CanHeat", "CanDry", "CanCool", "ModelSupportsAuto"})
+ATA_FAN_SPEED_FIELDS = frozenset({"HasAutomaticFanSpeed", "NumberOfFanSpeeds"})
+ATA_VANE_FIELDS = frozenset(
+    {
+        "HideVaneControls",
+        "ModelSupportsVaneHorizontal",
+        "ModelSupportsVaneVertical",
+        "SwingFunction",
+    }
+)
+ATA_VANE_ATTRIBUTE_FIELDS = ATA_VANE_FIELDS | {"VaneHorizontal", "VaneVertical"}
+ATA_TEMPERATURE_RANGE_FIELDS = frozenset(
+    {
+        "OperationMode",
+        "MinTempHeat",
+        "MaxTempHeat",
+        "MinTempCoolDry",
+        "MaxTempCoolDry",
+        "MinTempAutomatic",
+        "MaxTempAutomatic",
+    }
+)
+TEMPERATURE_STEP_FIELDS = frozenset({"TemperatureIncrement"})
+
 ATW_ZONE_HVAC_MODE_LOOKUP = {
     atw.ZONE_OPERATION_MODE_HEAT: HVACMode.HEAT,
     atw.ZONE_OPERATION_MODE_COOL: HVACMode.COOL,
@@ -65,22 +99,14 @@ async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up MelCloud device climate based on config_entry."""
-    mel_devices = hass.data[DOMAIN][entry.entry_id]
-    entities: list[AtaDeviceClimate | AtwDeviceZoneClimate] = [
-        AtaDeviceClimate(mel_device, mel_device.device)
-        for mel_device in mel_devices[DEVICE_TYPE_ATA]
-    ]
-    entities.extend(
-        [
-            AtwDeviceZoneClimate(mel_device, mel_device.device, zone)
-            for mel_device in mel_devices[DEVICE_TYPE_ATW]
-            for zone in mel_device.device.zones
-        ]
-    )
-    async_add_entities(
-        entities,
-        True,
-    )
+    coordinator: MelCloudDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    @callback
+    def _async_add_devices(mel_devices: list[MelCloudDevice]) -> None:
+        if entities := create_entities(coordinator, mel_devices):
+            async_add_entities(entities)
+
+    entry.async_on_unload(coordinator.async_add_ready_listener(_async_add_devices))
 
     platform = entity_platform.async_get_current_platform()
     platform.async_register_entity_service(
@@ -95,19 +121,43 @@ async def async_setup_entry(
     )
 
 
-class MelCloudClimate(ClimateEntity):
+def create_entities(
+    coordinator: MelCloudDataUpdateCoordinator, mel_devices: list[MelCloudDevice]
+) -> list[AtaDeviceClimate | AtwDeviceZoneClimate]:
+    """Create the climate entities of devices."""
+    entities: list[AtaDeviceClimate | AtwDeviceZoneClimate] = [
+        AtaDeviceClimate(coordinator, mel_device, mel_device.device)
+        for mel_device in mel_devices
+        if mel_device.device.device_type == DEVICE_TYPE_ATA
+    ]
+    entities.extend(
+        [
+            AtwDeviceZoneClimate(coordinator, mel_device, mel_device.device, zone)
+            for mel_device in mel_devices
+            if mel_device.device.device_type == DEVICE_TYPE_ATW
+            for zone in mel_device.zones
+        ]
+    )
+    return entities
+
+
+class MelCloudClimate(CoordinatorEntity[MelCloudDataUpdateCoordinator], ClimateEntity):
     """Base climate device."""
 
     _attr_temperature_unit = TEMP_CELSIUS
 
-    def __init__(self, device: MelCloudDevice) -> None:
+    def __init__(
+        self, coordinator: MelCloudDataUpdateCoordinator, device: MelCloudDevice
+    ) -> None:
         """Initialize the climate."""
+        super().__init__(coordinator, DeviceContext(device))
         self.api = device
         self._base_device = self.api.device
 
-    async def async_update(self) -> None:
-        """Update state from MELCloud."""
-        await self.api.async_update()
+    @property
+    def available(self) -> bool:
+        """Return True if entity is available."""
+        return super().available and self.api.available
 
     @property
     def device_info(self):
@@ -117,7 +167,11 @@ class MelCloudClimate(ClimateEntity):
     @property
     def target_temperature_step(self) -> float | None:
         """Return the supported step of target temperature."""
-        return self._base_device.temperature_increment
+        return self.api.capability(
+            "temperature_step",
+            TEMPERATURE_STEP_FIELDS,
+            lambda: self._base_device.temperature_increment,
+        )
 
 
 class AtaDeviceClimate(MelCloudClimate):
@@ -129,9 +183,14 @@ class AtaDeviceClimate(MelCloudClimate):
         | ClimateEntityFeature.SWING_MODE
     )
 
-    def __init__(self, device: MelCloudDevice, ata_device: AtaDevice) -> None:
+    def __init__(
+        self,
+        coordinator: MelCloudDataUpdateCoordinator,
+        device: MelCloudDevice,
+        ata_device: AtaDevice,
+    ) -> None:
         """Initialize the climate."""
-        super().__init__(device)
+        super().__init__(coordinator, device)
         self._device = ata_device
 
         self._attr_name = device.name
@@ -140,13 +199,27 @@ class AtaDeviceClimate(MelCloudClimate):
     @property
     def extra_state_attributes(self) -> dict[str, Any] | None:
         """Return the optional state attributes with device specific additions."""
+        attributes = {
+            **self.api.capability(
+                "vane_attributes", ATA_VANE_ATTRIBUTE_FIELDS, self._vane_attributes
+            ),
+            **_trend_attributes(self.api.trend("RoomTemperature", "SetTemperature")),
+        }
+        if self.api.pending:
+            attributes[ATTR_PENDING] = True
+        if self.api.stale:
+            attributes[ATTR_STALE] = True
+        return attributes
+
+    def _vane_attributes(self) -> dict[str, Any]:
+        """Build the vane state attributes."""
         attr = {}
 
         if vane_horizontal := self._device.vane_horizontal:
             attr.update(
                 {
                     ATTR_VANE_HORIZONTAL: vane_horizontal,
-                    ATTR_VANE_HORIZONTAL_POSITIONS: self._device.vane_horizontal_positions,
+                    ATTR_VANE_HORIZONTAL_POSITIONS: self._vane_horizontal_positions,
                 }
             )
 
@@ -154,11 +227,29 @@ class AtaDeviceClimate(MelCloudClimate):
             attr.update(
                 {
                     ATTR_VANE_VERTICAL: vane_vertical,
-                    ATTR_VANE_VERTICAL_POSITIONS: self._device.vane_vertical_positions,
+                    ATTR_VANE_VERTICAL_POSITIONS: self._vane_vertical_positions,
                 }
             )
         return attr
 
+    @property
+    def _vane_horizontal_positions(self) -> list[str]:
+        """Return the available horizontal vane positions."""
+        return self.api.capability(
+            "vane_horizontal_positions",
+            ATA_VANE_FIELDS,
+            lambda: self._device.vane_horizontal_positions,
+        )
+
+    @property
+    def _vane_vertical_positions(self) -> list[str]:
+        """Return the available vertical vane positions."""
+        return self.api.capability(
+            "vane_vertical_positions",
+            ATA_VANE_FIELDS,
+            lambda: self._device.vane_vertical_positions,
+        )
+
     @property
     def hvac_mode(self) -> HVACMode | None:
         """Return hvac operation ie. heat, cool mode."""
@@ -187,16 +278,22 @@ class AtaDeviceClimate(MelCloudClimate):
         """Set new target hvac mode."""
         set_dict: dict[str, Any] = {}
         self._apply_set_hvac_mode(hvac_mode, set_dict)
-        await self._device.set(set_dict)
+        await self.api.async_set(set_dict)
+        self.async_write_ha_state()
 
     @property
     def hvac_modes(self) -> list[HVACMode]:
         """Return the list of available hvac operation modes."""
-        return [HVACMode.OFF] + [
-            ATA_HVAC_MODE_LOOKUP[mode]
-            for mode in self._device.operation_modes
-            if mode in ATA_HVAC_MODE_LOOKUP
-        ]
+        return self.api.capability(
+            "hvac_modes",
+            ATA_HVAC_MODE_FIELDS,
+            lambda: [HVACMode.OFF]
+            + [
+                ATA_HVAC_MODE_LOOKUP[mode]
+                for mode in self._device.operation_modes
+                if mode in ATA_HVAC_MODE_LOOKUP
+            ],
+        )
 
     @property
     def current_temperature(self) -> float | None:
@@ -220,7 +317,8 @@ class AtaDeviceClimate(MelCloudClimate):
             set_dict["target_temperature"] = kwargs.get(ATTR_TEMPERATURE)
 
         if set_dict:
-            await self._device.set(set_dict)
+            await self.api.async_set(set_dict)
+            self.async_write_ha_state()
 
     @property
     def fan_mode(self) -> str | None:
@@ -229,28 +327,33 @@ class AtaDeviceClimate(MelCloudClimate):
 
     async def async_set_fan_mode(self, fan_mode: str) -> None:
         """Set new target fan mode."""
-        await self._device.set({"fan_speed": fan_mode})
+        await self.api.async_set({"fan_speed": fan_mode})
+        self.async_write_ha_state()
 
     @property
     def fan_modes(self) -> list[str] | None:
         """Return the list of available fan modes."""
-        return self._device.fan_speeds
+        return self.api.capability(
+            "fan_modes", ATA_FAN_SPEED_FIELDS, lambda: self._device.fan_speeds
+        )
 
     async def async_set_vane_horizontal(self, position: str) -> None:
         """Set horizontal vane position."""
-        if position not in self._device.vane_horizontal_positions:
+        if position not in self._vane_horizontal_positions:
             raise ValueError(
-                f"Invalid horizontal vane position {position}. Valid positions: [{self._device.vane_horizontal_positions}]."
+                f"Invalid horizontal vane position {position}. Valid positions: [{self._vane_horizontal_positions}]."
             )
-        await self._device.set({ata.PROPERTY_VANE_HORIZONTAL: position})
+        await self.api.async_set({ata.PROPERTY_VANE_HORIZONTAL: position})
+        self.async_write_ha_state()
 
     async def async_set_vane_vertical(self, position: str) -> None:
         """Set vertical vane position."""
-        if position not in self._device.vane_vertical_positions:
+        if position not in self._vane_vertical_positions:
             raise ValueError(
-                f"Invalid vertical vane position {position}. Valid positions: [{self._device.vane_vertical_positions}]."
+                f"Invalid vertical vane position {position}. Valid positions: [{self._vane_vertical_positions}]."
             )
-        await self._device.set({ata.PROPERTY_VANE_VERTICAL: position})
+        await self.api.async_set({ata.PROPERTY_VANE_VERTICAL: position})
+        self.async_write_ha_state()
 
     @property
     def swing_mode(self) -> str | None:
@@ -264,33 +367,45 @@ class AtaDeviceClimate(MelCloudClimate):
     @property
     def swing_modes(self) -> list[str] | None:
         """Return a list of available vertical vane positions and modes."""
-        return self._device.vane_vertical_positions
+        return self._vane_vertical_positions
 
     async def async_turn_on(self) -> None:
         """Turn the entity on."""
-        await self._device.set({"power": True})
+        await self.api.async_set({"power": True})
+        self.async_write_ha_state()
 
     async def async_turn_off(self) -> None:
         """Turn the entity off."""
-        await self._device.set({"power": False})
+        await self.api.async_set({"power": False})
+        self.async_write_ha_state()
 
     @property
     def min_temp(self) -> float:
         """Return the minimum temperature."""
-        min_value = self._device.target_temperature_min
-        if min_value is not None:
-            return min_value
-
-        return DEFAULT_MIN_TEMP
+        return self._temperature_range[0]
 
     @property
     def max_temp(self) -> float:
         """Return the maximum temperature."""
-        max_value = self._device.target_temperature_max
-        if max_value is not None:
-            return max_value
+        return self._temperature_range[1]
+
+    @property
+    def _temperature_range(self) -> tuple[float, float]:
+        """Return the target temperature range of the active operation mode."""
+        return self.api.capability(
+            "temperature_range",
+            ATA_TEMPERATURE_RANGE_FIELDS,
+            self._compute_temperature_range,
+        )
 
-        return DEFAULT_MAX_TEMP
+    def _compute_temperature_range(self) -> tuple[float, float]:
+        """Compute the target temperature range of the active operation mode."""
+        min_value = self._device.target_temperature_min
+        max_value = self._device.target_temperature_max
+        return (
+            DEFAULT_MIN_TEMP if min_value is None else min_value,
+            DEFAULT_MAX_TEMP if max_value is None else max_value,
+        )
 
 
 class AtwDeviceZoneClimate(MelCloudClimate):
@@ -301,10 +416,14 @@ class AtwDeviceZoneClimate(MelCloudClimate):
     _attr_supported_features = ClimateEntityFeature.TARGET_TEMPERATURE
 
     def __init__(
-        self, device: MelCloudDevice, atw_device: AtwDevice, atw_zone: Zone
+        self,
+        coordinator: MelCloudDataUpdateCoordinator,
+        device: MelCloudDevice,
+        atw_device: AtwDevice,
+        atw_zone: Zone,
     ) -> None:
         """Initialize the climate."""
-        super().__init__(device)
+        super().__init__(coordinator, device)
         self._device = atw_device
         self._zone = atw_zone
 
@@ -314,11 +433,22 @@ class AtwDeviceZoneClimate(MelCloudClimate):
     @property
     def extra_state_attributes(self) -> dict[str, Any]:
         """Return the optional state attributes with device specific additions."""
+        zone_index = self._zone.zone_index
         data = {
             ATTR_STATUS: ATW_ZONE_HVAC_MODE_LOOKUP.get(
                 self._zone.status, self._zone.status
-            )
+            ),
+            **_trend_attributes(
+                self.api.trend(
+                    f"RoomTemperatureZone{zone_index}",
+                    f"SetTemperatureZone{zone_index}",
+                )
+            ),
         }
+        if self.api.pending:
+            data[ATTR_PENDING] = True
+        if self.api.stale:
+            data[ATTR_STALE] = True
         return data
 
     @property
@@ -332,7 +462,8 @@ class AtwDeviceZoneClimate(MelCloudClimate):
     async def async_set_hvac_mode(self, hvac_mode: HVACMode) -> None:
         """Set new target hvac mode."""
         if hvac_mode == HVACMode.OFF:
-            await self._device.set({"power": False})
+            await self.api.async_set({"power": False})
+            self.async_write_ha_state()
             return
 
         operation_mode = ATW_ZONE_HVAC_MODE_REVERSE_LOOKUP.get(hvac_mode)
@@ -345,7 +476,8 @@ class AtwDeviceZoneClimate(MelCloudClimate):
             props = {PROPERTY_ZONE_2_OPERATION_MODE: operation_mode}
         if self.hvac_mode == HVACMode.OFF:
             props["power"] = True
-        await self._device.set(props)
+        await self.api.async_set(props)
+        self.async_write_ha_state()
 
     @property
     def hvac_modes(self) -> list[HVACMode]:
@@ -364,6 +496,20 @@ class AtwDeviceZoneClimate(MelCloudClimate):
 
     async def async_set_temperature(self, **kwargs: Any) -> None:
         """Set new target temperature."""
-        await self._zone.set_target_temperature(
-            kwargs.get("temperature", self.target_temperature)
+        if self._zone.zone_index == 1:
+            prop = PROPERTY_ZONE_1_TARGET_TEMPERATURE
+        else:
+            prop = PROPERTY_ZONE_2_TARGET_TEMPERATURE
+        await self.api.async_set(
+            {prop: kwargs.get("temperature", self.target_temperature)}
         )
+        self.async_write_ha_state()
+
+
+def _trend_attributes(trend: Trend) -> dict[str, Any]:
+    """Return the state attributes describing the room temperature trend."""
+    return {
+        ATTR_TEMPERATURE_TREND: trend.slope,
+        ATTR_AVERAGE_TEMPERATURE: trend.average,
+        ATTR_MINUTES_TO_TARGET: trend.minutes_to_target,
+    }
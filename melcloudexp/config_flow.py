@@ -2,18 +2,42 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import Mapping
 from http import HTTPStatus
+from typing import Any
 
 from aiohttp import ClientError, ClientResponseError
-from async_timeout import timeout
-import pymelcloud
+from pymelcloud import Device
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_PASSWORD, CONF_TOKEN, CONF_USERNAME
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.core import callback
+from homeassistant.data_entry_flow import FlowResult
 
-from .const import DOMAIN
+from . import DEFAULT_OPTIONS, async_fetch_devices, async_hand_off_devices
+from .auth import InvalidAuth, async_login, token_data
+from .const import (
+    CONF_CONFIGURATION_REFRESH_INTERVAL,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_MAX_POLL_INTERVAL,
+    CONF_POLL_INTERVAL,
+    CONF_REQUEST_TIMEOUT,
+    CONF_SETUP_TIMEOUT,
+    CONF_WRITE_WINDOW,
+    DOMAIN,
+)
+
+# Bounds of the options, keeping the API load of an account reasonable.
+OPTION_RANGES: dict[str, tuple[int, int]] = {
+    CONF_POLL_INTERVAL: (15, 3600),
+    CONF_MAX_POLL_INTERVAL: (60, 3600),
+    CONF_WRITE_WINDOW: (0, 5000),
+    CONF_CONFIGURATION_REFRESH_INTERVAL: (60, 86400),
+    CONF_MAX_CONCURRENT_REQUESTS: (1, 16),
+    CONF_REQUEST_TIMEOUT: (2, 60),
+    CONF_SETUP_TIMEOUT: (5, 300),
+}
 
 
 class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
@@ -21,12 +45,26 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
-    async def _create_entry(self, username: str, token: str):
+    _reauth_entry: config_entries.ConfigEntry | None = None
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> OptionsFlowHandler:
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
+    async def _create_entry(
+        self, username: str, data: dict[str, Any], devices: dict[str, list[Device]]
+    ):
         """Register new entry."""
         await self.async_set_unique_id(username)
-        self._abort_if_unique_id_configured({CONF_TOKEN: token})
+        self._abort_if_unique_id_configured(data)
+        # The setup of the entry picks up the devices instead of fetching them.
+        async_hand_off_devices(self.hass, data[CONF_TOKEN], devices)
         return self.async_create_entry(
-            title=username, data={CONF_USERNAME: username, CONF_TOKEN: token}
+            title=username, data={CONF_USERNAME: username, **data}
         )
 
     async def _create_client(
@@ -43,17 +81,15 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
             )
 
         try:
-            async with timeout(10):
-                if (acquired_token := token) is None:
-                    acquired_token = await pymelcloud.login(
-                        username,
-                        password,
-                        async_get_clientsession(self.hass),
-                    )
-                await pymelcloud.get_devices(
-                    acquired_token,
-                    async_get_clientsession(self.hass),
-                )
+            if token is None:
+                assert password is not None
+                token, expiry = await async_login(self.hass, username, password)
+                data = {**token_data(token, expiry), CONF_PASSWORD: password}
+            else:
+                data = {CONF_TOKEN: token}
+            devices = await async_fetch_devices(self.hass, token)
+        except InvalidAuth:
+            return self.async_abort(reason="invalid_auth")
         except ClientResponseError as err:
             if err.status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
                 return self.async_abort(reason="invalid_auth")
@@ -61,7 +97,7 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         except (asyncio.TimeoutError, ClientError):
             return self.async_abort(reason="cannot_connect")
 
-        return await self._create_entry(username, acquired_token)
+        return await self._create_entry(username, data, devices)
 
     async def async_step_user(self, user_input=None):
         """User initiated config flow."""
@@ -80,3 +116,86 @@ class FlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
         return await self._create_client(
             user_input[CONF_USERNAME], token=user_input[CONF_TOKEN]
         )
+
+    async def async_step_reauth(self, entry_data: Mapping[str, Any]) -> FlowResult:
+        """Handle a token MELCloud no longer accepts or that is about to expire."""
+        self._reauth_entry = self.hass.config_entries.async_get_entry(
+            self.context["entry_id"]
+        )
+        return await self.async_step_reauth_confirm()
+
+    async def async_step_reauth_confirm(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Log in again with the password of the account."""
+        assert self._reauth_entry is not None
+        username = self._reauth_entry.data[CONF_USERNAME]
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            password = user_input[CONF_PASSWORD]
+            try:
+                token, expiry = await async_login(self.hass, username, password)
+            except InvalidAuth:
+                errors["base"] = "invalid_auth"
+            except ClientResponseError as err:
+                if err.status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+                    errors["base"] = "invalid_auth"
+                else:
+                    errors["base"] = "cannot_connect"
+            except (asyncio.TimeoutError, ClientError):
+                errors["base"] = "cannot_connect"
+            else:
+                self.hass.config_entries.async_update_entry(
+                    self._reauth_entry,
+                    data={
+                        **self._reauth_entry.data,
+                        **token_data(token, expiry),
+                        CONF_PASSWORD: password,
+                    },
+                )
+                await self.hass.config_entries.async_reload(self._reauth_entry.entry_id)
+                return self.async_abort(reason="reauth_successful")
+
+        return self.async_show_form(
+            step_id="reauth_confirm",
+            data_schema=vol.Schema({vol.Required(CONF_PASSWORD): str}),
+            description_placeholders={"username": username},
+            errors=errors,
+        )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Tune the refreshes and writes of an account.
+
+    Changes apply to the running entry without reloading it, except for the
+    setup timeout, which applies from the next setup.
+    """
+
+    def __init__(self, config_entry: config_entries.ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            if user_input[CONF_MAX_POLL_INTERVAL] < user_input[CONF_POLL_INTERVAL]:
+                errors[CONF_MAX_POLL_INTERVAL] = "below_poll_interval"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        options = {**DEFAULT_OPTIONS, **self.config_entry.options, **(user_input or {})}
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(key, default=options[key]): vol.All(
+                        vol.Coerce(int), vol.Range(min=minimum, max=maximum)
+                    )
+                    for key, (minimum, maximum) in OPTION_RANGES.items()
+                }
+            ),
+            errors=errors,
+        )
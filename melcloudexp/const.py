@@ -3,12 +3,29 @@
 DOMAIN = "melcloud"
 
 CONF_POSITION = "position"
+CONF_TOKEN_EXPIRY = "token_expiry"
 
+# Options tuning the refreshes and writes of an account.
+CONF_CONFIGURATION_REFRESH_INTERVAL = "configuration_refresh_interval"
+CONF_MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
+CONF_MAX_POLL_INTERVAL = "max_poll_interval"
+CONF_POLL_INTERVAL = "poll_interval"
+CONF_REQUEST_TIMEOUT = "request_timeout"
+CONF_SETUP_TIMEOUT = "setup_timeout"
+CONF_WRITE_WINDOW = "write_window"
+
+ATTR_AVERAGE_TEMPERATURE = "average_temperature"
+ATTR_MINUTES_TO_TARGET = "minutes_to_target"
+ATTR_PENDING = "pending"
+ATTR_PROPERTIES = "properties"
+ATTR_STALE = "stale"
 ATTR_STATUS = "status"
+ATTR_TEMPERATURE_TREND = "temperature_trend"
 ATTR_VANE_HORIZONTAL = "vane_horizontal"
 ATTR_VANE_HORIZONTAL_POSITIONS = "vane_horizontal_positions"
 ATTR_VANE_VERTICAL = "vane_vertical"
 ATTR_VANE_VERTICAL_POSITIONS = "vane_vertical_positions"
 
+SERVICE_SET_MANY = "set_many"
 SERVICE_SET_VANE_HORIZONTAL = "set_vane_horizontal"
 SERVICE_SET_VANE_VERTICAL = "set_vane_vertical"
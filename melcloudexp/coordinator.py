@@ -0,0 +1,488 @@
+"""Data update coordinator for the MELCloud integration."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable, Mapping
+from datetime import timedelta
+from functools import partial
+import logging
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple, TypeVar
+
+from aiohttp import ClientConnectionError, ClientResponseError
+from pymelcloud.client import Client
+from pymelcloud.const import DEVICE_TYPE_LOOKUP
+
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    CONF_CONFIGURATION_REFRESH_INTERVAL,
+    CONF_MAX_CONCURRENT_REQUESTS,
+    CONF_MAX_POLL_INTERVAL,
+    CONF_POLL_INTERVAL,
+    CONF_REQUEST_TIMEOUT,
+    CONF_WRITE_WINDOW,
+    DOMAIN,
+)
+from .governor import CircuitOpen, RequestDeferred, RequestGovernor, RequestPriority
+from .scheduler import POLL_INTERVAL, PollScheduler
+from .snapshot import DeviceSnapshotStore
+
+if TYPE_CHECKING:
+    from . import MelCloudDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+MAX_CONCURRENT_UPDATES = 4
+MIN_REFRESH_DELAY = timedelta(seconds=5)
+# A refresh cycle gives up on the devices it has not updated after this many
+# request timeouts of the account, leaving them to the next cycle.
+REFRESH_DEADLINE_TIMEOUTS = 6
+
+
+# Field sets of device contexts, shared by every entity following the same fields.
+_FIELD_SETS: dict[frozenset[str], frozenset[str]] = {}
+
+
+def shared_fields(fields: Iterable[str]) -> frozenset[str]:
+    """Return the shared field set equal to fields."""
+    field_set = frozenset(fields)
+    return _FIELD_SETS.setdefault(field_set, field_set)
+
+
+class DeviceContext(NamedTuple):
+    """Coordinator context of an entity backed by device fields.
+
+    Fields of None make the entity follow every change of the device.
+    """
+
+    mel_device: MelCloudDevice
+    fields: frozenset[str] | None = None
+
+
+class MelCloudDataUpdateCoordinator(DataUpdateCoordinator[None]):
+    """Refresh every device of a MELCloud account once per cycle."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        mel_devices: dict[str, list[MelCloudDevice]],
+        governor: RequestGovernor,
+        snapshots: DeviceSnapshotStore | None = None,
+    ) -> None:
+        """Initialize the coordinator."""
+        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=POLL_INTERVAL)
+        self.mel_devices = mel_devices
+        self.governor = governor
+        self._snapshots = snapshots
+        self._reload_requested = False
+        self._user_refresh_requested = False
+        self._notified_success: bool | None = None
+        self.scheduler = PollScheduler()
+        self._update_concurrency = MAX_CONCURRENT_UPDATES
+        self._update_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPDATES)
+        # Devices held back from the platforms until their state is fetched.
+        self._unready = {
+            mel_device for mel_device in self.devices if not mel_device.ready
+        }
+        self._ready_listeners: list[Callable[[list[MelCloudDevice]], None]] = []
+        # Devices whose configuration expired, waiting for the shared refresh.
+        self._conf_expired: set[MelCloudDevice] = set()
+        self._conf_refreshing = False
+        for mel_device in self.devices:
+            mel_device.async_add_write_listener(self._async_handle_device_write)
+            mel_device.async_add_state_listener(self.async_update_listeners)
+            mel_device.async_add_conf_listener(self._async_handle_conf_expired)
+
+    @property
+    def devices(self) -> list[MelCloudDevice]:
+        """Return all devices of the account regardless of their type."""
+        return [
+            mel_device
+            for mel_devices in self.mel_devices.values()
+            for mel_device in mel_devices
+        ]
+
+    @property
+    def client(self) -> Client | None:
+        """Return the pymelcloud client shared by the devices of the account."""
+        if not (devices := self.devices):
+            return None
+        return devices[0].device._client  # pylint: disable=protected-access
+
+    @callback
+    def async_apply_options(self, options: Mapping[str, Any]) -> None:
+        """Tune the refreshes and writes of the account while running.
+
+        Options missing from options keep their current values.
+        """
+        if CONF_POLL_INTERVAL in options:
+            self.scheduler.poll_interval = timedelta(
+                seconds=options[CONF_POLL_INTERVAL]
+            )
+        if CONF_MAX_POLL_INTERVAL in options:
+            self.scheduler.ceiling = timedelta(seconds=options[CONF_MAX_POLL_INTERVAL])
+        if CONF_MAX_CONCURRENT_REQUESTS in options:
+            concurrency = options[CONF_MAX_CONCURRENT_REQUESTS]
+            self.governor.concurrency = concurrency
+            if concurrency != self._update_concurrency:
+                self._update_concurrency = concurrency
+                self._update_semaphore = asyncio.Semaphore(concurrency)
+        if CONF_REQUEST_TIMEOUT in options:
+            self.governor.request_timeout = options[CONF_REQUEST_TIMEOUT]
+        for mel_device in self.devices:
+            if CONF_WRITE_WINDOW in options:
+                mel_device.write_window = timedelta(
+                    milliseconds=options[CONF_WRITE_WINDOW]
+                )
+            if CONF_CONFIGURATION_REFRESH_INTERVAL in options:
+                mel_device.conf_update_interval = timedelta(
+                    seconds=options[CONF_CONFIGURATION_REFRESH_INTERVAL]
+                )
+
+        self._async_schedule_next_poll()
+        if self._listeners:
+            self._schedule_refresh()
+
+    @callback
+    def async_add_ready_listener(
+        self, ready_listener: Callable[[list[MelCloudDevice]], None]
+    ) -> CALLBACK_TYPE:
+        """Pass the ready devices to ready_listener, now and as more get ready.
+
+        Devices whose state could not be fetched during setup are retried in the
+        background and passed on once a refresh succeeds, so an unreachable
+        device does not hold back the entities of the others.
+        """
+        ready_listener(
+            [
+                mel_device
+                for mel_device in self.devices
+                if mel_device not in self._unready
+            ]
+        )
+        self._ready_listeners.append(ready_listener)
+
+        @callback
+        def remove_ready_listener() -> None:
+            self._ready_listeners.remove(ready_listener)
+
+        return remove_ready_listener
+
+    @callback
+    def _async_announce_ready(self) -> None:
+        """Pass the devices that got ready since the last refresh to the listeners."""
+        if not (
+            ready := [mel_device for mel_device in self._unready if mel_device.ready]
+        ):
+            return
+        self._unready.difference_update(ready)
+        for ready_listener in list(self._ready_listeners):
+            ready_listener(ready)
+
+    async def _async_limited(self, call: Callable[[], Awaitable[_T]]) -> _T:
+        """Run a device call while holding a concurrency slot."""
+        async with self._update_semaphore:
+            return await call()
+
+    async def async_bulk_update(
+        self,
+        devices: Iterable[MelCloudDevice] | None = None,
+        priority: RequestPriority = RequestPriority.BACKGROUND,
+    ) -> list[MelCloudDevice]:
+        """Refresh devices from a single ListDevices request.
+
+        The listing covers the whole account, only the given devices are
+        refreshed from it if devices is set. Returns the devices the listing
+        could not be applied to. Raises RequestDeferred if the request budget
+        does not allow the listing.
+        """
+        devices = self.devices if devices is None else list(devices)
+        if (client := self.client) is None:
+            return devices
+
+        try:
+            await self.governor.async_request(
+                client._fetch_device_confs,  # pylint: disable=protected-access
+                operation="list_devices",
+                priority=priority,
+                idempotent=True,
+            )
+        except (ClientConnectionError, ClientResponseError, asyncio.TimeoutError) as ex:
+            _LOGGER.debug("Bulk refresh failed, updating devices one by one: %s", ex)
+            return devices
+
+        confs = {
+            (conf.get("DeviceID"), conf.get("BuildingID")): conf
+            for conf in client.device_confs
+            if conf.get("Device", {}).get("DeviceType") in DEVICE_TYPE_LOOKUP
+        }
+        self._async_check_topology(confs.keys())
+
+        remaining = []
+        refreshed = []
+        for mel_device in devices:
+            conf = confs.get((mel_device.device_id, mel_device.building_id))
+            if conf is None:
+                continue
+            if not mel_device.apply_listing(conf):
+                remaining.append(mel_device)
+            else:
+                refreshed.append(mel_device)
+
+        await asyncio.gather(
+            *(
+                self._async_limited(mel_device.async_update_energy_report)
+                for mel_device in refreshed
+            )
+        )
+        return remaining
+
+    @callback
+    def _async_handle_conf_expired(self, mel_device: MelCloudDevice) -> None:
+        """Refresh the configuration of a device in the background.
+
+        Every device expiring until the refresh starts shares its listing.
+        """
+        self._conf_expired.add(mel_device)
+        if self._conf_refreshing or self.config_entry is None:
+            return
+        self._conf_refreshing = True
+        self.config_entry.async_create_background_task(
+            self.hass,
+            self._async_refresh_conf(),
+            f"{DOMAIN} {self.config_entry.title} configuration refresh",
+        )
+
+    async def _async_refresh_conf(self) -> None:
+        """Refresh the devices whose configuration expired from the listing."""
+        try:
+            while self._conf_expired:
+                expired, self._conf_expired = self._conf_expired, set()
+                await self.async_bulk_update(expired)
+        except RequestDeferred:
+            _LOGGER.debug("Configuration refresh deferred, request budget is low")
+            self._conf_expired.clear()
+            return
+        finally:
+            self._conf_refreshing = False
+        self.async_update_listeners()
+
+    @callback
+    def _async_check_topology(self, listed: Iterable[tuple[int, int]]) -> None:
+        """Reload the config entry if devices were added to or removed from the account."""
+        known = {
+            (mel_device.device_id, mel_device.building_id)
+            for mel_device in self.devices
+        }
+        if (
+            known == set(listed)
+            or self._reload_requested
+            or self.config_entry is None
+            or self.config_entry.state is not ConfigEntryState.LOADED
+        ):
+            return
+
+        _LOGGER.info("Devices of %s changed, reloading", self.config_entry.title)
+        self._reload_requested = True
+        self.hass.async_create_task(self._async_reload(self.config_entry.entry_id))
+
+    async def _async_reload(self, entry_id: str) -> None:
+        """Drop the outdated snapshot and reload the config entry."""
+        if self._snapshots is not None:
+            await self._snapshots.async_remove()
+        await self.hass.config_entries.async_reload(entry_id)
+
+    @callback
+    def _async_schedule_next_poll(self) -> None:
+        """Set the refresh interval to wake up when the next device is due.
+
+        The listing refreshes every device at once, so devices polled after their
+        cloud syncs wait for the last of them to sync. Other devices wake the
+        coordinator as soon as they are due.
+        """
+        now = dt_util.utcnow()
+        next_polls = []
+        next_synced_poll = None
+        for mel_device in self.devices:
+            next_poll = self.scheduler.next_poll(mel_device, now)
+            if self.scheduler.follows_sync(mel_device, now):
+                if next_synced_poll is None or next_poll > next_synced_poll:
+                    next_synced_poll = next_poll
+            else:
+                next_polls.append(next_poll)
+        if next_synced_poll is not None:
+            next_polls.append(next_synced_poll)
+        next_poll = min(next_polls, default=now + self.scheduler.poll_interval)
+        self.update_interval = max(next_poll - now, MIN_REFRESH_DELAY)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify the entities whose device fields changed since the last call.
+
+        Every listener is notified when the coordinator fails or recovers.
+        """
+        notify_all = self.last_update_success is not self._notified_success
+        self._notified_success = self.last_update_success
+        for update_callback, context in list(self._listeners.values()):
+            if (
+                notify_all
+                or not isinstance(context, DeviceContext)
+                or context.mel_device.has_changed(context.fields)
+            ):
+                update_callback()
+        for mel_device in self.devices:
+            mel_device.async_clear_changes()
+
+    async def async_request_refresh(self) -> None:
+        """Request a refresh of every device on behalf of the user."""
+        self._user_refresh_requested = True
+        await super().async_request_refresh()
+
+    @callback
+    def _async_handle_device_write(self) -> None:
+        """Poll sooner after a device has been written to."""
+        self._async_schedule_next_poll()
+        if self._listeners:
+            self._schedule_refresh()
+
+    @callback
+    def _async_check_circuit(self) -> None:
+        """Fail the refresh while the circuit of the account is open.
+
+        Every entity turns unavailable at once and the next refresh waits for
+        the circuit to let a probe through.
+        """
+        try:
+            self.governor.breaker.check()
+        except CircuitOpen as ex:
+            self.update_interval = max(
+                timedelta(seconds=self.governor.breaker.retry_in), MIN_REFRESH_DELAY
+            )
+            raise UpdateFailed(str(ex)) from ex
+
+    @callback
+    def _async_check_suspended(self) -> None:
+        """Fail the refresh while requests wait for the token to be renewed.
+
+        Every entity turns unavailable until the renewal resumes requests.
+        """
+        if self.governor.suspended:
+            raise UpdateFailed(
+                "MELCloud rejected the token, requests are suspended until it is renewed"
+            )
+
+    async def _async_update_devices(
+        self,
+        devices: Iterable[MelCloudDevice],
+        priority: RequestPriority,
+        deadline: float,
+    ) -> set[MelCloudDevice]:
+        """Update devices one by one until the monotonic deadline.
+
+        Devices that have never been fetched wait for the request budget
+        rather than being deferred, so setup does not drop them. Returns the
+        devices deferred by the request budget or the deadline.
+        """
+        tasks = {
+            asyncio.create_task(
+                self._async_limited(
+                    partial(
+                        mel_device.async_update,
+                        priority
+                        if mel_device.ready
+                        else min(priority, RequestPriority.USER),
+                    )
+                )
+            ): mel_device
+            for mel_device in devices
+        }
+        if not tasks:
+            return set()
+        done, pending = await asyncio.wait(
+            tasks, timeout=max(deadline - time.monotonic(), 0)
+        )
+        for task in pending:
+            task.cancel()
+        if pending:
+            _LOGGER.debug(
+                "Refresh deadline passed, %s devices left to the next cycle",
+                len(pending),
+            )
+            await asyncio.wait(pending)
+        return {tasks[task] for task in pending} | {
+            tasks[task] for task in done if not task.result()
+        }
+
+    async def _async_update_data(self) -> None:
+        """Refresh the devices of the account that are due for a poll.
+
+        A ListDevices response refreshes every device of the account, so the
+        listing is requested whenever at least one device is due. Per-device
+        requests are made only for due devices. Refreshes requested by the user
+        poll every device ahead of background refreshes in the request budget,
+        and so does the setup of devices that have never been fetched.
+        Devices deferred by the budget are polled again in the next cycle.
+        The listing is also requested once the configuration of a device has
+        expired. No request is made while MELCloud is unreachable or the token
+        is being renewed. Devices still being updated once the refresh deadline
+        has passed are left to the next cycle.
+        """
+        self._async_check_circuit()
+        self._async_check_suspended()
+        deadline = (
+            time.monotonic() + self.governor.request_timeout * REFRESH_DEADLINE_TIMEOUTS
+        )
+        now = dt_util.utcnow()
+        devices = self.devices
+        if self._user_refresh_requested:
+            self._user_refresh_requested = False
+            priority = RequestPriority.USER
+            due = set(devices)
+        else:
+            priority = RequestPriority.BACKGROUND
+            due = {
+                mel_device
+                for mel_device in devices
+                if self.scheduler.is_due(mel_device, now)
+            }
+        if due or any(mel_device.conf_expired for mel_device in devices):
+            try:
+                remaining = set(
+                    await self.async_bulk_update(
+                        priority=min(priority, RequestPriority.USER)
+                        if self._unready
+                        else priority
+                    )
+                )
+            except RequestDeferred:
+                self._async_check_circuit()
+                self._async_check_suspended()
+                _LOGGER.debug("Refresh deferred, request budget is low")
+                self._async_schedule_next_poll()
+                return
+            deferred = await self._async_update_devices(
+                remaining & due, priority, deadline
+            )
+            for mel_device in devices:
+                if mel_device in deferred:
+                    continue
+                if mel_device in due or mel_device not in remaining:
+                    self.scheduler.record_poll(mel_device, now)
+
+        self._async_schedule_next_poll()
+        self._async_announce_ready()
+        self._async_check_circuit()
+        self._async_check_suspended()
+        if devices and not any(mel_device.available for mel_device in devices):
+            raise UpdateFailed("Unable to reach any device on MELCloud")
+
+        if self._snapshots is not None and (client := self.client) is not None:
+            self._snapshots.async_schedule_save(
+                client, [mel_device.device for mel_device in devices]
+            )
@@ -0,0 +1,63 @@
+"""Diagnostics support for MELCloud."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD, CONF_TOKEN, CONF_USERNAME
+from homeassistant.core import HomeAssistant
+import homeassistant.util.dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import MelCloudDataUpdateCoordinator
+
+TO_REDACT = {
+    CONF_PASSWORD,
+    CONF_TOKEN,
+    CONF_USERNAME,
+    "mac",
+    "serial",
+    "title",
+    "unique_id",
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: MelCloudDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    now = dt_util.utcnow()
+    governor = coordinator.governor
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "request_budget": governor.usage,
+        "telemetry": governor.telemetry.as_dict(),
+        "devices": [
+            async_redact_data(
+                {
+                    "name": mel_device.name,
+                    "device_id": mel_device.device_id,
+                    "building_id": mel_device.building_id,
+                    "device_type": mel_device.device.device_type,
+                    "mac": mel_device.device.mac,
+                    "serial": mel_device.device.serial,
+                    "available": mel_device.available,
+                    "stale": mel_device.stale,
+                    "last_refresh": mel_device.last_refresh,
+                    "refresh_age_seconds": None
+                    if mel_device.last_refresh is None
+                    else round((now - mel_device.last_refresh).total_seconds()),
+                    "last_write": mel_device.last_write,
+                    "poll_interval_seconds": coordinator.scheduler.interval(
+                        mel_device, now
+                    ).total_seconds(),
+                    "follows_sync": coordinator.scheduler.follows_sync(mel_device, now),
+                    "next_poll": coordinator.scheduler.next_poll(mel_device, now),
+                },
+                TO_REDACT,
+            )
+            for mel_device in coordinator.devices
+        ],
+    }
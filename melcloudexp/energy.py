@@ -0,0 +1,300 @@
+"""Import the energy history of MELCloud devices into long-term statistics."""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+import logging
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import ClientError
+import pymelcloud.client
+
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import ENERGY_KILO_WATT_HOUR
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+import homeassistant.util.dt as dt_util
+
+from .const import DOMAIN
+from .governor import RequestDeferred, RequestGovernor
+
+if TYPE_CHECKING:
+    from . import MelCloudDevice
+    from .coordinator import MelCloudDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+IMPORT_INTERVAL = timedelta(hours=1)
+# History imported for devices seen for the first time.
+BACKFILL_DAYS = 30
+# Days before yesterday are requested at daily resolution from a single report
+# and spread evenly over their hours.
+HOURLY_DAYS = 2
+# Hours are imported once MELCloud had time to settle their consumption.
+SETTLE_DELAY = timedelta(hours=1)
+
+ENERGY_REPORT_MODES = ("Heating", "Cooling", "Auto", "Dry", "Fan", "Other", "HotWater")
+
+
+def _progress_store(hass: HomeAssistant, entry_id: str) -> Store[dict[str, Any]]:
+    """Return the store holding the import progress of a config entry."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.energy")
+
+
+async def async_remove_progress(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the import progress of a removed config entry."""
+    await _progress_store(hass, entry_id).async_remove()
+
+
+def statistic_id(mel_device: MelCloudDevice) -> str:
+    """Return the ID of the energy statistic of a device."""
+    return f"{DOMAIN}:energy_{mel_device.device_id}"
+
+
+def _bucket_values(report: dict[str, Any]) -> list[float]:
+    """Return the consumption of every bucket of a report summed over all modes."""
+    series = [
+        values
+        for mode in ENERGY_REPORT_MODES
+        if isinstance(values := report.get(mode), list)
+    ]
+    return [sum(bucket) for bucket in zip(*series)]
+
+
+def _day_hours(day: date) -> list[datetime]:
+    """Return the start of every UTC hour of a local day.
+
+    Days with a DST transition have 23 or 25 hours.
+    """
+    midnight = dt_util.as_utc(dt_util.start_of_local_day(day))
+    next_midnight = dt_util.as_utc(dt_util.start_of_local_day(day + timedelta(days=1)))
+    return [
+        midnight + timedelta(hours=index)
+        for index in range(round((next_midnight - midnight) / timedelta(hours=1)))
+    ]
+
+
+def _hour_start(start: datetime) -> datetime:
+    """Return the UTC hour a bucket starting at start is imported into.
+
+    Statistics start on full UTC hours, buckets of time zones offset by half an
+    hour count towards the hour they start in.
+    """
+    return dt_util.as_utc(start).replace(minute=0, second=0, microsecond=0)
+
+
+class EnergyHistoryImporter:
+    """Stream MELCloud energy reports into external statistics.
+
+    A watermark per device marks the first hour that has not been imported yet
+    so every run only requests the reports of new intervals. Days older than
+    HOURLY_DAYS are requested in bulk at daily resolution, recent days one
+    report per day at hourly resolution. Nothing is imported before every
+    device of the account is ready.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, entry_id: str, governor: RequestGovernor
+    ) -> None:
+        """Initialize the importer."""
+        self.hass = hass
+        self.governor = governor
+        self._store = _progress_store(hass, entry_id)
+        self._progress: dict[str, dict[str, Any]] | None = None
+
+    @callback
+    def async_start(
+        self, entry: ConfigEntry, coordinator: MelCloudDataUpdateCoordinator
+    ) -> CALLBACK_TYPE:
+        """Import once every device is ready and then every IMPORT_INTERVAL.
+
+        Imports stop when the returned callback is called.
+        """
+        devices = coordinator.devices
+        unready = set(devices)
+        unsub_interval: CALLBACK_TYPE | None = None
+
+        async def _async_import(now: datetime | None = None) -> None:
+            await self.async_import(devices)
+
+        @callback
+        def _async_handle_ready(ready: list[MelCloudDevice]) -> None:
+            nonlocal unsub_interval
+            unready.difference_update(ready)
+            if unready or unsub_interval is not None:
+                return
+            entry.async_create_background_task(
+                self.hass,
+                _async_import(),
+                f"{DOMAIN} {entry.title} energy history import",
+            )
+            unsub_interval = async_track_time_interval(
+                self.hass, _async_import, IMPORT_INTERVAL
+            )
+
+        unsub_ready = coordinator.async_add_ready_listener(_async_handle_ready)
+
+        @callback
+        def _async_stop() -> None:
+            unsub_ready()
+            if unsub_interval is not None:
+                unsub_interval()
+
+        return _async_stop
+
+    async def async_import(self, devices: list[MelCloudDevice]) -> None:
+        """Import the energy consumed since the watermark of every device."""
+        if self._progress is None:
+            self._progress = await self._store.async_load() or {}
+
+        complete_until = (dt_util.now() - SETTLE_DELAY).replace(
+            minute=0, second=0, microsecond=0
+        )
+        for mel_device in devices:
+            try:
+                await self._async_import_device(mel_device, complete_until)
+            except RequestDeferred:
+                _LOGGER.debug("Energy history import deferred, request budget is low")
+                break
+        self._store.async_delay_save(lambda: self._progress or {}, SAVE_DELAY)
+
+    async def _async_import_device(
+        self, mel_device: MelCloudDevice, complete_until: datetime
+    ) -> None:
+        """Import the complete hours after the watermark of a device."""
+        assert self._progress is not None
+        progress = self._progress.setdefault(str(mel_device.device_id), {})
+        if (watermark := dt_util.parse_datetime(progress.get("watermark", ""))) is None:
+            watermark = dt_util.start_of_local_day(
+                complete_until.date() - timedelta(days=BACKFILL_DAYS)
+            )
+        else:
+            watermark = dt_util.as_local(watermark)
+        total = progress.get("sum", 0.0)
+        hourly_from = dt_util.start_of_local_day(
+            complete_until.date() - timedelta(days=HOURLY_DAYS - 1)
+        )
+
+        statistics: list[StatisticData] = []
+        try:
+            while watermark < complete_until:
+                try:
+                    buckets, next_watermark = await self._async_fetch_buckets(
+                        mel_device, watermark, hourly_from, complete_until
+                    )
+                except (ClientError, asyncio.TimeoutError) as ex:
+                    _LOGGER.debug(
+                        "Energy history import failed for %s: %s", mel_device.name, ex
+                    )
+                    break
+
+                for start, value in buckets:
+                    if not watermark <= start < next_watermark:
+                        continue
+                    total += value
+                    start = _hour_start(start)
+                    if statistics and statistics[-1]["start"] >= start:
+                        # Buckets sharing an hour are imported as one.
+                        statistics[-1]["state"] += value
+                        statistics[-1]["sum"] = total
+                        continue
+                    statistics.append(
+                        StatisticData(start=start, state=value, sum=total)
+                    )
+                watermark = next_watermark
+                progress["watermark"] = watermark.isoformat()
+                progress["sum"] = total
+        finally:
+            # Keep what was imported before the budget deferred the import.
+            if statistics:
+                async_add_external_statistics(
+                    self.hass,
+                    StatisticMetaData(
+                        has_mean=False,
+                        has_sum=True,
+                        name=f"{mel_device.name} Energy",
+                        source=DOMAIN,
+                        statistic_id=statistic_id(mel_device),
+                        unit_of_measurement=ENERGY_KILO_WATT_HOUR,
+                    ),
+                    statistics,
+                )
+
+    async def _async_fetch_buckets(
+        self,
+        mel_device: MelCloudDevice,
+        watermark: datetime,
+        hourly_from: datetime,
+        complete_until: datetime,
+    ) -> tuple[list[tuple[datetime, float]], datetime]:
+        """Return the buckets of the next report to import and the next watermark."""
+        day = watermark.date()
+        if watermark < hourly_from and watermark == dt_util.start_of_local_day(day):
+            buckets = await self._async_daily_buckets(
+                mel_device, day, hourly_from.date()
+            )
+            return buckets, hourly_from
+
+        buckets = await self._async_hourly_buckets(mel_device, day)
+        return buckets, min(
+            dt_util.start_of_local_day(day + timedelta(days=1)), complete_until
+        )
+
+    async def _async_daily_buckets(
+        self, mel_device: MelCloudDevice, first: date, end: date
+    ) -> list[tuple[datetime, float]]:
+        """Return the daily consumption from first up to end spread over the hours.
+
+        Importing a day as a single hour would show its consumption as a spike.
+        """
+        report = await self._async_fetch_report(mel_device, first, end)
+        buckets = []
+        for index, value in enumerate(_bucket_values(report)):
+            hours = _day_hours(first + timedelta(days=index))
+            buckets.extend((hour, value / len(hours)) for hour in hours)
+        return buckets
+
+    async def _async_hourly_buckets(
+        self, mel_device: MelCloudDevice, day: date
+    ) -> list[tuple[datetime, float]]:
+        """Return the hourly consumption of a day.
+
+        The hours are counted in UTC, days with a DST transition have no
+        repeated or missing hours.
+        """
+        report = await self._async_fetch_report(mel_device, day, day)
+        return list(zip(_day_hours(day), _bucket_values(report)))
+
+    async def _async_fetch_report(
+        self, mel_device: MelCloudDevice, first: date, end: date
+    ) -> dict[str, Any]:
+        """Request the energy report of a date range.
+
+        pymelcloud only requests the report of the last few days.
+        """
+        # pylint: disable=protected-access
+        client = mel_device.device._client
+
+        async def _async_request() -> dict[str, Any]:
+            async with client._session.post(
+                f"{pymelcloud.client.BASE_URL}/EnergyCost/Report",
+                headers=pymelcloud.client._headers(client._token),
+                json={
+                    "DeviceId": mel_device.device_id,
+                    "UseCurrency": False,
+                    "FromDate": f"{first.isoformat()}T00:00:00",
+                    "ToDate": f"{end.isoformat()}T00:00:00",
+                },
+                raise_for_status=True,
+            ) as resp:
+                return await resp.json()
+
+        return await self.governor.async_request(
+            _async_request, operation="energy_history", idempotent=True
+        )
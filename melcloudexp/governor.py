@@ -0,0 +1,386 @@
+"""Per-account request budget and circuit breaker for the MELCloud integration."""
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from enum import Enum, IntEnum
+from http import HTTPStatus
+import logging
+import random
+import time
+from typing import Any, TypeVar
+
+from aiohttp import ClientConnectionError, ClientResponseError
+from async_timeout import timeout
+
+from homeassistant.core import CALLBACK_TYPE, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .telemetry import ApiTelemetry
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+DEFAULT_CAPACITY = 300
+DEFAULT_REFILL_RATE = 2.0
+BACKGROUND_RESERVE = 0.25
+# Requests of an account in flight at once.
+DEFAULT_CONCURRENCY = 4
+# Consecutive failed requests that open the circuit.
+FAILURE_THRESHOLD = 5
+# How long the circuit stays open before a probe, doubled after every failed
+# probe up to MAX_OPEN_DURATION.
+OPEN_DURATION = 30.0
+MAX_OPEN_DURATION = 600.0
+# Seconds a request may take per unit of its cost.
+DEFAULT_REQUEST_TIMEOUT = 10
+# Idempotent requests are retried this many times after connection failures,
+# timeouts and server errors, waiting RETRY_DELAY doubled per retry and
+# jittered by up to half of it in either direction.
+RETRIES = 2
+RETRY_DELAY = 1.0
+
+
+class RequestPriority(IntEnum):
+    """Priority of a MELCloud request, lower values are served first."""
+
+    WRITE = 0
+    USER = 1
+    BACKGROUND = 2
+
+
+class RequestDeferred(HomeAssistantError):
+    """Request deferred because the budget is low or requests are suspended."""
+
+
+class CircuitOpen(RequestDeferred):
+    """Request rejected because MELCloud is unreachable."""
+
+
+class CircuitState(Enum):
+    """State of a circuit breaker."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop requesting MELCloud while it is unreachable.
+
+    The circuit opens after FAILURE_THRESHOLD consecutive connection failures,
+    timeouts or server errors, and every request is rejected right away. Once
+    the open duration has passed, a single probe request is let through. The
+    circuit closes if the probe succeeds and opens for twice as long if it
+    fails.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        open_duration: float = OPEN_DURATION,
+    ) -> None:
+        """Initialize a closed circuit."""
+        self.failure_threshold = failure_threshold
+        self.base_open_duration = open_duration
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._open_duration = open_duration
+        self._retry_at = 0.0
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        """Return True if requests are rejected until retry_in has passed."""
+        return self.state is not CircuitState.CLOSED and (
+            self._probing or time.monotonic() < self._retry_at
+        )
+
+    @property
+    def retry_in(self) -> float:
+        """Return the seconds until a probe is let through."""
+        if self.state is CircuitState.CLOSED:
+            return 0.0
+        return max(self._retry_at - time.monotonic(), 0.0)
+
+    def check(self, probe: bool = False) -> bool:
+        """Raise CircuitOpen if a request may not be made now.
+
+        With probe set, the caller is about to make the request and becomes
+        the probe of a half-open circuit. Returns True if it did.
+        """
+        if self.state is CircuitState.CLOSED:
+            return False
+        if self.is_open:
+            raise CircuitOpen(
+                f"MELCloud is unreachable, retrying in {round(self.retry_in)} s"
+            )
+        if probe:
+            self.state = CircuitState.HALF_OPEN
+            self._probing = True
+        return probe
+
+    def record(self, success: bool | None, probing: bool = False) -> None:
+        """Record the outcome of a request, None if it had none.
+
+        Probes ending without an outcome, such as cancelled ones, let the next
+        request probe instead.
+        """
+        if probing:
+            self._probing = False
+        if success is None:
+            return
+        if success:
+            if self.state is not CircuitState.CLOSED:
+                _LOGGER.info("MELCloud is reachable again")
+            self.state = CircuitState.CLOSED
+            self.failures = 0
+            self._open_duration = self.base_open_duration
+            return
+
+        self.failures += 1
+        if probing:
+            self._open_duration = min(self._open_duration * 2, MAX_OPEN_DURATION)
+        elif self.state is not CircuitState.CLOSED or (
+            self.failures < self.failure_threshold
+        ):
+            return
+        self.state = CircuitState.OPEN
+        self._retry_at = time.monotonic() + self._open_duration
+        _LOGGER.warning(
+            "MELCloud is unreachable after %s failed requests, pausing requests "
+            "for %s s",
+            self.failures,
+            round(self._open_duration),
+        )
+
+
+class RequestGovernor:
+    """Token bucket shared by every MELCloud request of an account.
+
+    Writes and user initiated refreshes wait for budget, writes ahead of
+    refreshes. Background requests never wait. They are deferred instead
+    whenever a prioritized request is waiting or taking the tokens would leave
+    less than the reserve kept for prioritized requests.
+
+    Every request is suspended once MELCloud rejects the token, until the
+    credentials have been renewed.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        refill_rate: float = DEFAULT_REFILL_RATE,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+    ) -> None:
+        """Initialize a full bucket."""
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.request_timeout = request_timeout
+        self._concurrency_limit = concurrency
+        self._concurrency = asyncio.Semaphore(concurrency)
+        self.deferred = 0
+        self.telemetry = ApiTelemetry()
+        self._tokens = float(capacity)
+        self._refilled = time.monotonic()
+        self._waiting: Counter[RequestPriority] = Counter()
+        self.suspended = False
+        self._suspend_listeners: list[Callable[[], None]] = []
+        self.breaker = CircuitBreaker()
+
+    @property
+    def tokens(self) -> float:
+        """Return the number of requests that can be made right now."""
+        self._refill()
+        return self._tokens
+
+    @property
+    def concurrency(self) -> int:
+        """Return the number of requests allowed in flight at once."""
+        return self._concurrency_limit
+
+    @concurrency.setter
+    def concurrency(self, concurrency: int) -> None:
+        """Change the limit. Requests in flight finish under the old one."""
+        if concurrency == self._concurrency_limit:
+            return
+        self._concurrency_limit = concurrency
+        self._concurrency = asyncio.Semaphore(concurrency)
+
+    @property
+    def usage(self) -> dict[str, Any]:
+        """Return the current budget usage."""
+        return {
+            "tokens": round(self.tokens, 1),
+            "capacity": self.capacity,
+            "refill_per_minute": round(self.refill_rate * 60, 1),
+            "deferred": self.deferred,
+            "waiting": sum(self._waiting.values()),
+            "concurrency": self._concurrency_limit,
+            "request_timeout": self.request_timeout,
+            "suspended": self.suspended,
+            "circuit": self.breaker.state.value,
+        }
+
+    @callback
+    def async_suspend(self) -> None:
+        """Defer every request until resumed and notify the suspend listeners."""
+        if self.suspended:
+            return
+        self.suspended = True
+        for suspend_listener in list(self._suspend_listeners):
+            suspend_listener()
+
+    @callback
+    def async_resume(self) -> None:
+        """Allow requests again."""
+        self.suspended = False
+
+    @callback
+    def async_add_suspend_listener(
+        self, suspend_listener: Callable[[], None]
+    ) -> CALLBACK_TYPE:
+        """Listen for requests getting suspended."""
+        self._suspend_listeners.append(suspend_listener)
+
+        @callback
+        def remove_suspend_listener() -> None:
+            self._suspend_listeners.remove(suspend_listener)
+
+        return remove_suspend_listener
+
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._refilled) * self.refill_rate
+        )
+        self._refilled = now
+
+    def _waiting_ahead(self, priority: RequestPriority) -> bool:
+        """Return True if requests with a higher priority are waiting."""
+        return any(
+            count for waiting, count in self._waiting.items() if waiting < priority
+        )
+
+    async def _async_acquire(self, cost: int, priority: RequestPriority) -> None:
+        """Take cost tokens from the bucket."""
+        self._refill()
+        if priority is RequestPriority.BACKGROUND:
+            reserve = self.capacity * BACKGROUND_RESERVE
+            if self._waiting_ahead(priority) or self._tokens - cost < reserve:
+                self.deferred += 1
+                raise RequestDeferred("MELCloud request budget is low")
+            self._tokens -= cost
+            return
+
+        self._waiting[priority] += 1
+        try:
+            while self._waiting_ahead(priority) or self._tokens < cost:
+                await asyncio.sleep(
+                    max(cost - self._tokens, 1) / self.refill_rate,
+                )
+                self._refill()
+            self._tokens -= cost
+        finally:
+            self._waiting[priority] -= 1
+
+    async def async_request(
+        self,
+        call: Callable[[], Awaitable[_T]],
+        *,
+        operation: str,
+        cost: int = 1,
+        priority: RequestPriority = RequestPriority.BACKGROUND,
+        idempotent: bool = False,
+        deadline: float | None = None,
+    ) -> _T:
+        """Make a MELCloud request once the budget allows it.
+
+        At most concurrency requests of the account are in flight at once. The
+        request is recorded in the telemetry under the operation name.
+        Raises RequestDeferred for background requests that have to wait and
+        for every request while requests are suspended. Requests are suspended
+        when MELCloud rejects the token. Raises CircuitOpen while MELCloud is
+        unreachable.
+
+        Every attempt is cancelled with asyncio.TimeoutError after deadline
+        seconds, request_timeout per unit of cost by default. Idempotent
+        requests are retried up to RETRIES times after connection failures,
+        timeouts and server errors, each retry taking its cost from the budget
+        again.
+        """
+        if deadline is None:
+            deadline = self.request_timeout * cost
+        retries = RETRIES if idempotent else 0
+        attempt = 0
+        while True:
+            try:
+                return await self._async_attempt(
+                    call, operation, cost, priority, deadline
+                )
+            except (
+                ClientConnectionError,
+                asyncio.TimeoutError,
+                ClientResponseError,
+            ) as ex:
+                if attempt == retries or not self.retryable(ex):
+                    raise
+                delay = RETRY_DELAY * 2**attempt * random.uniform(0.5, 1.5)
+                _LOGGER.debug("Retrying %s in %.1f s after %r", operation, delay, ex)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def retryable(self, ex: BaseException) -> bool:
+        """Return True if a request failing with ex may be retried.
+
+        Requests are not retried once the failures opened the circuit.
+        """
+        if self.breaker.state is not CircuitState.CLOSED:
+            return False
+        if isinstance(ex, ClientResponseError):
+            return ex.status >= HTTPStatus.INTERNAL_SERVER_ERROR
+        return isinstance(ex, (ClientConnectionError, asyncio.TimeoutError))
+
+    async def _async_attempt(
+        self,
+        call: Callable[[], Awaitable[_T]],
+        operation: str,
+        cost: int,
+        priority: RequestPriority,
+        deadline: float,
+    ) -> _T:
+        """Make a single attempt of a request."""
+
+        async def _async_call() -> _T:
+            async with timeout(deadline):
+                return await call()
+
+        if self.suspended:
+            raise RequestDeferred("MELCloud requests are suspended")
+        self.breaker.check()
+        await self._async_acquire(cost, priority)
+        async with self._concurrency:
+            if self.suspended:
+                raise RequestDeferred("MELCloud requests are suspended")
+            probing = self.breaker.check(probe=True)
+            try:
+                result = await self.telemetry.async_measure(operation, _async_call)
+            except (ClientConnectionError, asyncio.TimeoutError):
+                self.breaker.record(False, probing)
+                raise
+            except ClientResponseError as ex:
+                self.breaker.record(
+                    ex.status < HTTPStatus.INTERNAL_SERVER_ERROR, probing
+                )
+                if ex.status == HTTPStatus.UNAUTHORIZED:
+                    self.async_suspend()
+                raise
+            except BaseException:
+                self.breaker.record(None, probing)
+                raise
+            self.breaker.record(True, probing)
+            return result
@@ -0,0 +1,122 @@
+"""Short in-memory history of MELCloud device temperatures."""
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import timedelta
+
+# Samples kept per field. With MIN_SAMPLE_SPACING this covers at least an hour.
+HISTORY_SIZE = 60
+MIN_SAMPLE_SPACING = timedelta(seconds=60)
+TREND_WINDOW = timedelta(minutes=30)
+AVERAGE_WINDOW = timedelta(minutes=15)
+# Trends need samples spanning at least this long.
+MIN_TREND_SPAN = timedelta(minutes=5)
+# Targets closer than this count as reached, ones further out than
+# MAX_TIME_TO_TARGET as not being reached.
+TARGET_TOLERANCE = 0.25
+MAX_TIME_TO_TARGET = timedelta(hours=24)
+
+
+@dataclass(frozen=True)
+class Trend:
+    """Recent development of a temperature."""
+
+    slope: float | None = None
+    average: float | None = None
+    minutes_to_target: int | None = None
+
+
+class SampleHistory:
+    """Fixed-size ring buffer of timestamped samples of one field.
+
+    The samples live in two preallocated arrays, so the memory of a history
+    does not grow with the samples added.
+    """
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        """Initialize an empty history."""
+        self._times = array("d", [0.0]) * size
+        self._values = array("d", [0.0]) * size
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples kept."""
+        return self._count
+
+    def add(self, when: float, value: float) -> bool:
+        """Add a sample taken at monotonic time when.
+
+        Samples closer than MIN_SAMPLE_SPACING to the latest one are dropped.
+        Returns True if the sample was added.
+        """
+        if self._count and when - self._times[self._next - 1] < (
+            MIN_SAMPLE_SPACING.total_seconds()
+        ):
+            return False
+        self._times[self._next] = when
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+        return True
+
+    def _recent(self, window: timedelta) -> Iterator[tuple[float, float]]:
+        """Yield the samples within window of the latest one, newest first."""
+        if not self._count:
+            return
+        since = self._times[self._next - 1] - window.total_seconds()
+        for offset in range(1, self._count + 1):
+            index = self._next - offset
+            if (when := self._times[index]) < since:
+                return
+            yield when, self._values[index]
+
+    def trend(self, target: float | None = None) -> Trend:
+        """Return the slope, recent average and time to reach target."""
+        if not self._count:
+            return Trend()
+        latest = self._values[self._next - 1]
+        averaged = [value for _, value in self._recent(AVERAGE_WINDOW)]
+        average = round(sum(averaged) / len(averaged), 2)
+        if (slope := self._slope()) is None:
+            return Trend(average=average)
+        return Trend(
+            slope=round(slope * 3600, 2),
+            average=average,
+            minutes_to_target=_minutes_to_target(latest, target, slope),
+        )
+
+    def _slope(self) -> float | None:
+        """Return the least squares slope per second over TREND_WINDOW."""
+        samples = list(self._recent(TREND_WINDOW))
+        if len(samples) < 2 or (
+            samples[0][0] - samples[-1][0] < MIN_TREND_SPAN.total_seconds()
+        ):
+            return None
+        origin = samples[-1][0]
+        count = len(samples)
+        mean_time = sum(when - origin for when, _ in samples) / count
+        mean_value = sum(value for _, value in samples) / count
+        covariance = variance = 0.0
+        for when, value in samples:
+            offset = when - origin - mean_time
+            covariance += offset * (value - mean_value)
+            variance += offset * offset
+        return covariance / variance
+
+
+def _minutes_to_target(
+    current: float, target: float | None, slope: float
+) -> int | None:
+    """Return the minutes until the current value reaches target at slope."""
+    if target is None:
+        return None
+    if abs(difference := target - current) <= TARGET_TOLERANCE:
+        return 0
+    if slope * difference <= 0:
+        return None
+    if (seconds := difference / slope) > MAX_TIME_TO_TARGET.total_seconds():
+        return None
+    return round(seconds / 60)
@@ -0,0 +1,116 @@
+"""Metrics derived from the energy meters of MELCloud heat pumps."""
+from __future__ import annotations
+
+from datetime import timedelta
+import math
+from typing import Any
+
+# MELCloud updates the energy meters every 1.5 to 3 hours, the metrics are
+# smoothed over several updates.
+HEATING_POWER_WINDOW = timedelta(hours=6)
+COP_WINDOW = timedelta(hours=24)
+
+CONSUMED_KEY = "CurrentEnergyConsumed"
+PRODUCED_KEY = "CurrentEnergyProduced"
+
+
+class DecayingCounter:
+    """Increase of a cumulative meter, exponentially decayed over a window.
+
+    Every sample is folded in with a constant number of operations, so no
+    history is kept.
+    """
+
+    def __init__(self, window: timedelta) -> None:
+        """Initialize an empty counter."""
+        self._time_constant = window.total_seconds()
+        self._last_value: float | None = None
+        self._last_time: float | None = None
+        # Decayed increase of the meter and the decayed seconds it took.
+        self.energy = 0.0
+        self.elapsed = 0.0
+
+    def add(self, value: float | None, now: float) -> bool:
+        """Fold a meter reading taken at monotonic time now into the counter.
+
+        Missing and zero readings, which MELCloud reports while the meter is
+        unavailable, are skipped. The meter going backwards restarts the
+        increase from the new reading. Returns True if the counter changed.
+        """
+        if not value:
+            return False
+        last_value, last_time = self._last_value, self._last_time
+        self._last_value, self._last_time = value, now
+        if last_value is None or last_time is None or value < last_value:
+            return False
+        if (elapsed := now - last_time) <= 0:
+            return False
+        decay = math.exp(-elapsed / self._time_constant)
+        self.energy = self.energy * decay + value - last_value
+        self.elapsed = self.elapsed * decay + elapsed
+        return True
+
+    @property
+    def rate(self) -> float | None:
+        """Return the average increase per second, None without samples."""
+        if not self.elapsed:
+            return None
+        return self.energy / self.elapsed
+
+
+class AtwMetrics:
+    """Heating power and COP estimates of an Air-to-Water heat pump.
+
+    The estimates are updated from the energy meters of the device
+    configuration whenever the listing is applied. Devices without meters
+    report zero readings, metering turns True once both meters have read.
+    """
+
+    def __init__(self) -> None:
+        """Initialize metrics without samples."""
+        self.metering = False
+        self._produced = DecayingCounter(COP_WINDOW)
+        self._consumed = DecayingCounter(COP_WINDOW)
+        self._produced_power = DecayingCounter(HEATING_POWER_WINDOW)
+
+    @staticmethod
+    def supported(conf: dict[str, Any] | None) -> bool:
+        """Return True if the device reports the meters the metrics need."""
+        device = (conf or {}).get("Device", {})
+        return PRODUCED_KEY in device and CONSUMED_KEY in device
+
+    def update(self, conf: dict[str, Any] | None, now: float) -> bool:
+        """Fold the meters of a device configuration into the metrics.
+
+        Returns True if any metric may have changed.
+        """
+        device = (conf or {}).get("Device", {})
+        produced = device.get(PRODUCED_KEY)
+        consumed = device.get(CONSUMED_KEY)
+        self.metering = self.metering or bool(produced and consumed)
+        changed = self._produced.add(produced, now)
+        changed |= self._consumed.add(consumed, now)
+        changed |= self._produced_power.add(produced, now)
+        return changed
+
+    @property
+    def heating_power(self) -> float | None:
+        """Return the estimated heat output in kW."""
+        if (rate := self._produced_power.rate) is None:
+            return None
+        # Wh per second to kW.
+        return round(rate * 3.6, 2)
+
+    @property
+    def cop(self) -> float | None:
+        """Return the ratio of heat produced to energy consumed."""
+        if self._consumed.energy <= 0 or self._produced.elapsed == 0:
+            return None
+        return round(self._produced.energy / self._consumed.energy, 2)
+
+
+def delta_t(flow: float | None, return_: float | None) -> float | None:
+    """Return the difference between the flow and return temperatures."""
+    if flow is None or return_ is None:
+        return None
+    return round(flow - return_, 1)
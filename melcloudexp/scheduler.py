@@ -0,0 +1,170 @@
+"""Adaptive poll scheduling for MELCloud devices."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import random
+from typing import TYPE_CHECKING, Any
+
+import homeassistant.util.dt as dt_util
+
+if TYPE_CHECKING:
+    from . import MelCloudDevice
+
+POLL_INTERVAL = timedelta(seconds=60)
+FAST_POLL_INTERVAL = timedelta(seconds=15)
+FAST_POLL_DURATION = timedelta(minutes=2)
+IDLE_POLL_INTERVAL = timedelta(minutes=5)
+MAX_POLL_INTERVAL = timedelta(minutes=15)
+MAX_BACKOFF_EXPONENT = 8
+# Base of the backoff of devices whose state has never been fetched.
+SETUP_RETRY_INTERVAL = timedelta(seconds=15)
+BACKOFF_JITTER = 0.2
+# Devices reporting their cloud syncs are polled this long after the next one,
+# but at least every SYNC_FALLBACK_INTERVAL.
+SYNC_DELAY = timedelta(seconds=5)
+SYNC_FALLBACK_INTERVAL = timedelta(minutes=5)
+MIN_SYNC_PERIOD = timedelta(seconds=15)
+SYNC_FIELDS = frozenset({"LastCommunication", "NextCommunication"})
+
+
+def _parse_timestamp(value: Any) -> datetime | None:
+    """Parse a MELCloud timestamp, which is in UTC."""
+    if not isinstance(value, str) or (parsed := dt_util.parse_datetime(value)) is None:
+        return None
+    return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=dt_util.UTC)
+
+
+class PollScheduler:
+    """Decide when each device of an account is due for a poll.
+
+    Devices are polled faster for a while after a write, slower while they are
+    powered off and with a jittered exponential backoff after connection
+    failures. Devices that never returned their state back off from a shorter
+    base so they join soon after a transient failure at setup. The regular
+    interval and the ceiling are configured per account, no interval exceeds
+    the ceiling.
+
+    Otherwise devices that report when they communicate with MELCloud are
+    polled right after their next expected sync instead of on a fixed
+    interval, so polls fetch new data.
+    """
+
+    def __init__(
+        self,
+        ceiling: timedelta = MAX_POLL_INTERVAL,
+        poll_interval: timedelta = POLL_INTERVAL,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.ceiling = ceiling
+        self.poll_interval = poll_interval
+        self._last_poll: dict[int, datetime] = {}
+        self._failures: dict[int, int] = {}
+        self._jitter: dict[int, float] = {}
+
+    def interval(self, mel_device: MelCloudDevice, now: datetime) -> timedelta:
+        """Return the current poll interval of a device."""
+        if failures := self._failures.get(mel_device.device_id, 0):
+            base = self.poll_interval if mel_device.ready else SETUP_RETRY_INTERVAL
+            interval = (
+                base
+                * 2 ** min(failures, MAX_BACKOFF_EXPONENT)
+                * self._jitter.get(mel_device.device_id, 1.0)
+            )
+        elif (
+            mel_device.last_write is not None
+            and now - mel_device.last_write < FAST_POLL_DURATION
+        ):
+            interval = min(FAST_POLL_INTERVAL, self.poll_interval)
+        elif mel_device.device.power is False:
+            interval = max(IDLE_POLL_INTERVAL, self.poll_interval)
+        else:
+            interval = self.poll_interval
+        return min(interval, self.ceiling)
+
+    def _sync_schedule(
+        self, mel_device: MelCloudDevice
+    ) -> tuple[datetime, timedelta] | None:
+        """Return the next communication of the device and the time between them."""
+        if not mel_device.ready:
+            return None
+
+        def _compute() -> tuple[datetime, timedelta] | None:
+            # pylint: disable-next=protected-access
+            state = mel_device.device._state
+            last = _parse_timestamp(state.get("LastCommunication"))
+            upcoming = _parse_timestamp(state.get("NextCommunication"))
+            if last is None or upcoming is None or upcoming - last < MIN_SYNC_PERIOD:
+                return None
+            return upcoming, upcoming - last
+
+        return mel_device.capability("sync_schedule", SYNC_FIELDS, _compute)
+
+    def next_sync(self, mel_device: MelCloudDevice, after: datetime) -> datetime | None:
+        """Return the first expected cloud sync of the device after a time.
+
+        Syncs are projected from the last and next communication reported by the
+        device as the state is not refreshed on every sync.
+        """
+        if (schedule := self._sync_schedule(mel_device)) is None:
+            return None
+        upcoming, period = schedule
+        if upcoming <= after:
+            upcoming += period * ((after - upcoming) // period + 1)
+        return upcoming
+
+    def follows_sync(self, mel_device: MelCloudDevice, now: datetime) -> bool:
+        """Return True if the device is polled after its cloud syncs."""
+        return (
+            mel_device.device_id not in self._failures
+            and (
+                mel_device.last_write is None
+                or now - mel_device.last_write >= FAST_POLL_DURATION
+            )
+            and self._sync_schedule(mel_device) is not None
+        )
+
+    def next_poll(self, mel_device: MelCloudDevice, now: datetime) -> datetime:
+        """Return when the device is due for its next poll."""
+        if (last_poll := self._last_poll.get(mel_device.device_id)) is None:
+            return now
+        if not self.follows_sync(mel_device, now):
+            return last_poll + self.interval(mel_device, now)
+
+        # Syncs are not followed more often than the regular interval.
+        earliest = last_poll + (
+            max(IDLE_POLL_INTERVAL, self.poll_interval)
+            if mel_device.device.power is False
+            else self.poll_interval
+        )
+        sync = self.next_sync(mel_device, earliest - SYNC_DELAY)
+        assert sync is not None
+        return min(
+            sync + SYNC_DELAY,
+            last_poll
+            + min(max(SYNC_FALLBACK_INTERVAL, self.poll_interval), self.ceiling),
+        )
+
+    def is_due(self, mel_device: MelCloudDevice, now: datetime) -> bool:
+        """Return True if the device should be polled now."""
+        return self.next_poll(mel_device, now) <= now
+
+    def record_poll(self, mel_device: MelCloudDevice, now: datetime) -> None:
+        """Record the outcome of a poll."""
+        self._last_poll[mel_device.device_id] = now
+        if mel_device.available:
+            self._failures.pop(mel_device.device_id, None)
+            self._jitter.pop(mel_device.device_id, None)
+        else:
+            self._failures[mel_device.device_id] = (
+                self._failures.get(mel_device.device_id, 0) + 1
+            )
+            # Spread the retries of devices that failed together.
+            self._jitter[mel_device.device_id] = random.uniform(
+                1 - BACKOFF_JITTER, 1 + BACKOFF_JITTER
+            )
+
+    def reset(self) -> None:
+        """Forget the poll history, making every device due."""
+        self._last_poll.clear()
+        self._failures.clear()
+        self._jitter.clear()
@@ -1,8 +1,8 @@
 """Support for MelCloud device sensors."""
 from __future__ import annotations
 
-from collections.abc import Callable
-from dataclasses import dataclass
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, replace
 from typing import Any
 
 from pymelcloud import DEVICE_TYPE_ATA, DEVICE_TYPE_ATW
@@ -15,12 +15,35 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import ENERGY_KILO_WATT_HOUR, TEMP_CELSIUS
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    ENERGY_KILO_WATT_HOUR,
+    TEMP_CELSIUS,
+    UnitOfPower,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from . import (
+    ENERGY_REPORT_FIELD,
+    HISTORY_FIELD,
+    LAST_REFRESH_FIELD,
+    METRICS_FIELD,
+    MelCloudDevice,
+)
+from .const import ATTR_AVERAGE_TEMPERATURE, DOMAIN
+from .coordinator import (
+    DeviceContext,
+    MelCloudDataUpdateCoordinator,
+    shared_fields,
+)
+from .governor import RequestGovernor
+from .history import Trend
+from .metrics import delta_t
 
-from . import MelCloudDevice
-from .const import DOMAIN
+PARALLEL_UPDATES = 0
 
 
 @dataclass
@@ -37,6 +60,50 @@ class MelcloudSensorEntityDescription(
 ):
     """Describes Melcloud sensor entity."""
 
+    fields_fn: Callable[[Any], Iterable[str]] | None = None
+    enabled_default_fn: Callable[[Any], bool] | None = None
+
+
+@dataclass
+class MelcloudAccountRequiredKeysMixin:
+    """Mixin for required keys of account sensors."""
+
+    value_fn: Callable[[RequestGovernor], Any]
+    attributes_fn: Callable[[RequestGovernor], dict[str, Any]]
+
+
+@dataclass
+class MelcloudAccountSensorEntityDescription(
+    SensorEntityDescription, MelcloudAccountRequiredKeysMixin
+):
+    """Describes Melcloud account sensor entity."""
+
+
+@dataclass
+class MelcloudTrendRequiredKeysMixin:
+    """Mixin for required keys of trend sensors."""
+
+    value_fn: Callable[[Trend], Any]
+
+
+@dataclass
+class MelcloudTrendSensorEntityDescription(
+    SensorEntityDescription, MelcloudTrendRequiredKeysMixin
+):
+    """Describes Melcloud sensor entity following a room temperature trend."""
+
+
+LAST_REFRESH_SENSOR = MelcloudSensorEntityDescription(
+    key="last_refresh",
+    name="Last Refresh",
+    icon="mdi:cloud-refresh",
+    device_class=SensorDeviceClass.TIMESTAMP,
+    entity_category=EntityCategory.DIAGNOSTIC,
+    entity_registry_enabled_default=False,
+    value_fn=lambda x: x.last_refresh,
+    fields_fn=lambda x: {LAST_REFRESH_FIELD},
+    enabled=lambda x: True,
+)
 
 ATA_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
     MelcloudSensorEntityDescription(
@@ -46,6 +113,7 @@ ATA_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=TEMP_CELSIUS,
         device_class=SensorDeviceClass.TEMPERATURE,
         value_fn=lambda x: x.device.room_temperature,
+        fields_fn=lambda x: {"RoomTemperature"},
         enabled=lambda x: True,
     ),
     MelcloudSensorEntityDescription(
@@ -55,6 +123,7 @@ ATA_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=ENERGY_KILO_WATT_HOUR,
         device_class=SensorDeviceClass.ENERGY,
         value_fn=lambda x: x.device.total_energy_consumed,
+        fields_fn=lambda x: {"CurrentEnergyConsumed"},
         enabled=lambda x: x.device.has_energy_consumed_meter,
     ),
     MelcloudSensorEntityDescription(
@@ -64,8 +133,10 @@ ATA_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=ENERGY_KILO_WATT_HOUR,
         device_class=SensorDeviceClass.ENERGY,
         value_fn=lambda x: x.device.daily_energy_consumed,
+        fields_fn=lambda x: {ENERGY_REPORT_FIELD},
         enabled=lambda x: True,
     ),
+    LAST_REFRESH_SENSOR,
 )
 ATW_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
     MelcloudSensorEntityDescription(
@@ -75,6 +146,7 @@ ATW_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=TEMP_CELSIUS,
         device_class=SensorDeviceClass.TEMPERATURE,
         value_fn=lambda x: x.device.outside_temperature,
+        fields_fn=lambda x: {"OutdoorTemperature"},
         enabled=lambda x: True,
     ),
     MelcloudSensorEntityDescription(
@@ -84,6 +156,7 @@ ATW_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=TEMP_CELSIUS,
         device_class=SensorDeviceClass.TEMPERATURE,
         value_fn=lambda x: x.device.tank_temperature,
+        fields_fn=lambda x: {"TankWaterTemperature"},
         enabled=lambda x: True,
     ),
     MelcloudSensorEntityDescription(
@@ -93,8 +166,30 @@ ATW_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=ENERGY_KILO_WATT_HOUR,
         device_class=SensorDeviceClass.ENERGY,
         value_fn=lambda x: x.device.daily_energy_consumed,
+        fields_fn=lambda x: {ENERGY_REPORT_FIELD},
         enabled=lambda x: True,
     ),
+    MelcloudSensorEntityDescription(
+        key="heating_power",
+        name="Heating Power",
+        icon="mdi:heat-wave",
+        native_unit_of_measurement=UnitOfPower.KILO_WATT,
+        device_class=SensorDeviceClass.POWER,
+        value_fn=lambda x: x.metrics.heating_power,
+        fields_fn=lambda x: {METRICS_FIELD},
+        enabled=lambda x: x.metrics is not None,
+        enabled_default_fn=lambda x: x.metrics.metering,
+    ),
+    MelcloudSensorEntityDescription(
+        key="cop",
+        name="COP",
+        icon="mdi:heat-pump",
+        value_fn=lambda x: x.metrics.cop,
+        fields_fn=lambda x: {METRICS_FIELD},
+        enabled=lambda x: x.metrics is not None,
+        enabled_default_fn=lambda x: x.metrics.metering,
+    ),
+    LAST_REFRESH_SENSOR,
 )
 ATW_ZONE_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
     MelcloudSensorEntityDescription(
@@ -104,6 +199,7 @@ ATW_ZONE_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=TEMP_CELSIUS,
         device_class=SensorDeviceClass.TEMPERATURE,
         value_fn=lambda zone: zone.room_temperature,
+        fields_fn=lambda zone: {f"RoomTemperatureZone{zone.zone_index}"},
         enabled=lambda x: True,
     ),
     MelcloudSensorEntityDescription(
@@ -113,6 +209,7 @@ ATW_ZONE_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=TEMP_CELSIUS,
         device_class=SensorDeviceClass.TEMPERATURE,
         value_fn=lambda zone: zone.flow_temperature,
+        fields_fn=lambda zone: {"FlowTemperature"},
         enabled=lambda x: True,
     ),
     MelcloudSensorEntityDescription(
@@ -122,70 +219,206 @@ ATW_ZONE_SENSORS: tuple[MelcloudSensorEntityDescription, ...] = (
         native_unit_of_measurement=TEMP_CELSIUS,
         device_class=SensorDeviceClass.TEMPERATURE,
         value_fn=lambda zone: zone.return_temperature,
+        fields_fn=lambda zone: {"ReturnTemperature"},
+        enabled=lambda x: True,
+    ),
+    MelcloudSensorEntityDescription(
+        key="flow_return_delta",
+        name="Flow Return Delta",
+        icon="mdi:thermometer-minus",
+        # No temperature device class: Home Assistant would convert the
+        # difference like an absolute temperature, 5 °C into 41 °F.
+        native_unit_of_measurement=TEMP_CELSIUS,
+        state_class=SensorStateClass.MEASUREMENT,
+        # Derived from the flow and return temperature sensors.
+        entity_registry_enabled_default=False,
+        value_fn=lambda zone: delta_t(zone.flow_temperature, zone.return_temperature),
+        fields_fn=lambda zone: {"FlowTemperature", "ReturnTemperature"},
         enabled=lambda x: True,
     ),
 )
+# Zone sensor descriptions per zone index. Keys of zones past the first are
+# suffixed with the zone to keep the unique IDs of the zones apart.
+ZONE_SENSORS: dict[int, tuple[MelcloudSensorEntityDescription, ...]] = {
+    1: ATW_ZONE_SENSORS,
+    2: tuple(
+        replace(description, key=f"{description.key}-zone-2")
+        for description in ATW_ZONE_SENSORS
+    ),
+}
+
+TREND_SENSORS: tuple[MelcloudTrendSensorEntityDescription, ...] = (
+    MelcloudTrendSensorEntityDescription(
+        key="room_temperature_trend",
+        name="Room Temperature Trend",
+        icon="mdi:thermometer-chevron-up",
+        native_unit_of_measurement=f"{TEMP_CELSIUS}/h",
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda trend: trend.slope,
+    ),
+    MelcloudTrendSensorEntityDescription(
+        key="time_to_target",
+        name="Time To Target",
+        icon="mdi:timer-sand",
+        native_unit_of_measurement=UnitOfTime.MINUTES,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        value_fn=lambda trend: trend.minutes_to_target,
+    ),
+)
+
+ACCOUNT_SENSORS: tuple[MelcloudAccountSensorEntityDescription, ...] = (
+    MelcloudAccountSensorEntityDescription(
+        key="request_budget",
+        name="Request Budget",
+        icon="mdi:speedometer",
+        native_unit_of_measurement="requests",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda governor: round(governor.tokens),
+        attributes_fn=lambda governor: governor.usage,
+    ),
+    MelcloudAccountSensorEntityDescription(
+        key="api_latency",
+        name="API Latency",
+        icon="mdi:timer-outline",
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda governor: None
+        if (latency := governor.telemetry.mean_latency) is None
+        else round(latency * 1000, 1),
+        attributes_fn=lambda governor: {
+            "operations": governor.telemetry.as_dict()["operations"]
+        },
+    ),
+    MelcloudAccountSensorEntityDescription(
+        key="api_calls_per_hour",
+        name="API Calls Per Hour",
+        icon="mdi:cloud-sync",
+        native_unit_of_measurement="requests/h",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda governor: governor.telemetry.calls_per_hour,
+        attributes_fn=lambda governor: {},
+    ),
+    MelcloudAccountSensorEntityDescription(
+        key="api_errors",
+        name="API Errors",
+        icon="mdi:cloud-alert",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda governor: governor.telemetry.error_count,
+        attributes_fn=lambda governor: {"errors": dict(governor.telemetry.errors)},
+    ),
+)
 
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up MELCloud device sensors based on config_entry."""
-    mel_devices = hass.data[DOMAIN].get(entry.entry_id)
-
-    entities: list[MelDeviceSensor] = [
-        MelDeviceSensor(mel_device, description)
-        for description in ATA_SENSORS
-        for mel_device in mel_devices[DEVICE_TYPE_ATA]
-        if description.enabled(mel_device)
-    ] + [
-        MelDeviceSensor(mel_device, description)
-        for description in ATW_SENSORS
-        for mel_device in mel_devices[DEVICE_TYPE_ATW]
-        if description.enabled(mel_device)
-    ]
-    entities.extend(
+    coordinator: MelCloudDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    async_add_entities(
         [
-            AtwZoneSensor(mel_device, zone, description)
-            for mel_device in mel_devices[DEVICE_TYPE_ATW]
-            for zone in mel_device.device.zones
-            for description in ATW_ZONE_SENSORS
-            if description.enabled(zone)
+            MelCloudAccountSensor(coordinator, entry, description)
+            for description in ACCOUNT_SENSORS
         ]
     )
-    async_add_entities(entities, True)
 
+    @callback
+    def _async_add_devices(mel_devices: list[MelCloudDevice]) -> None:
+        if entities := create_entities(coordinator, mel_devices):
+            async_add_entities(entities)
 
-class MelDeviceSensor(SensorEntity):
+    entry.async_on_unload(coordinator.async_add_ready_listener(_async_add_devices))
+
+
+def create_entities(
+    coordinator: MelCloudDataUpdateCoordinator, mel_devices: list[MelCloudDevice]
+) -> list[SensorEntity]:
+    """Create the sensors of devices."""
+    entities: list[SensorEntity] = []
+    for mel_device in mel_devices:
+        if mel_device.device.device_type == DEVICE_TYPE_ATA:
+            entities.extend(
+                MelDeviceSensor(coordinator, mel_device, description)
+                for description in ATA_SENSORS
+                if description.enabled(mel_device)
+            )
+            entities.extend(
+                TrendSensor(coordinator, mel_device, description)
+                for description in TREND_SENSORS
+            )
+        elif mel_device.device.device_type == DEVICE_TYPE_ATW:
+            entities.extend(
+                MelDeviceSensor(coordinator, mel_device, description)
+                for description in ATW_SENSORS
+                if description.enabled(mel_device)
+            )
+            for zone in mel_device.zones:
+                entities.extend(
+                    AtwZoneSensor(coordinator, mel_device, zone, description)
+                    for description in ZONE_SENSORS[zone.zone_index]
+                    if description.enabled(zone)
+                )
+                entities.extend(
+                    TrendSensor(coordinator, mel_device, description, zone)
+                    for description in TREND_SENSORS
+                )
+    return entities
+
+
+class MelDeviceSensor(CoordinatorEntity[MelCloudDataUpdateCoordinator], SensorEntity):
     """Representation of a Sensor."""
 
     entity_description: MelcloudSensorEntityDescription
 
     def __init__(
         self,
+        coordinator: MelCloudDataUpdateCoordinator,
         api: MelCloudDevice,
         description: MelcloudSensorEntityDescription,
     ) -> None:
         """Initialize the sensor."""
+        super().__init__(coordinator, self._device_context(api, description))
         self._api = api
         self.entity_description = description
 
         self._attr_name = f"{api.name} {description.name}"
         self._attr_unique_id = f"{api.device.serial}-{api.device.mac}-{description.key}"
 
+        if description.enabled_default_fn is not None:
+            self._attr_entity_registry_enabled_default = description.enabled_default_fn(
+                self._fields_source(api)
+            )
         if description.device_class == SensorDeviceClass.ENERGY:
             self._attr_state_class = SensorStateClass.TOTAL_INCREASING
-        else:
+        elif description.device_class != SensorDeviceClass.TIMESTAMP:
             self._attr_state_class = SensorStateClass.MEASUREMENT
 
+    def _device_context(
+        self, api: MelCloudDevice, description: MelcloudSensorEntityDescription
+    ) -> DeviceContext:
+        """Return the coordinator context following the fields behind the sensor."""
+        if description.fields_fn is None:
+            return DeviceContext(api)
+        return DeviceContext(
+            api, shared_fields(description.fields_fn(self._fields_source(api)))
+        )
+
+    def _fields_source(self, api: MelCloudDevice) -> Any:
+        """Return the object the description functions are applied to."""
+        return api
+
     @property
     def native_value(self):
         """Return the state of the sensor."""
         return self.entity_description.value_fn(self._api)
 
-    async def async_update(self) -> None:
-        """Retrieve latest state."""
-        await self._api.async_update()
+    @property
+    def available(self) -> bool:
+        """Return True if entity is available."""
+        return super().available and self._api.available
 
     @property
     def device_info(self):
@@ -198,18 +431,112 @@ class AtwZoneSensor(MelDeviceSensor):
 
     def __init__(
         self,
+        coordinator: MelCloudDataUpdateCoordinator,
         api: MelCloudDevice,
         zone: Zone,
         description: MelcloudSensorEntityDescription,
     ) -> None:
         """Initialize the sensor."""
-        if zone.zone_index != 1:
-            description.key = f"{description.key}-zone-{zone.zone_index}"
-        super().__init__(api, description)
         self._zone = zone
+        super().__init__(coordinator, api, description)
         self._attr_name = f"{api.name} {zone.name} {description.name}"
 
+    def _fields_source(self, api: MelCloudDevice) -> Any:
+        """Return the object the description functions are applied to."""
+        return self._zone
+
     @property
     def native_value(self):
         """Return zone based state."""
         return self.entity_description.value_fn(self._zone)
+
+
+class TrendSensor(CoordinatorEntity[MelCloudDataUpdateCoordinator], SensorEntity):
+    """Sensor following the recent room temperatures of a device or zone."""
+
+    entity_description: MelcloudTrendSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: MelCloudDataUpdateCoordinator,
+        api: MelCloudDevice,
+        description: MelcloudTrendSensorEntityDescription,
+        zone: Zone | None = None,
+    ) -> None:
+        """Initialize the sensor."""
+        unique_id = f"{api.device.serial}-{api.device.mac}-{description.key}"
+        if zone is None:
+            self._key, self._target_key = "RoomTemperature", "SetTemperature"
+            self._attr_name = f"{api.name} {description.name}"
+        else:
+            self._key = f"RoomTemperatureZone{zone.zone_index}"
+            self._target_key = f"SetTemperatureZone{zone.zone_index}"
+            self._attr_name = f"{api.name} {zone.name} {description.name}"
+            if zone.zone_index != 1:
+                unique_id = f"{unique_id}-zone-{zone.zone_index}"
+        super().__init__(
+            coordinator,
+            DeviceContext(api, shared_fields((HISTORY_FIELD, self._target_key))),
+        )
+        self._api = api
+        self.entity_description = description
+        self._attr_unique_id = unique_id
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self.entity_description.value_fn(
+            self._api.trend(self._key, self._target_key)
+        )
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the recent average the trend is based on."""
+        return {
+            ATTR_AVERAGE_TEMPERATURE: self._api.trend(
+                self._key, self._target_key
+            ).average
+        }
+
+    @property
+    def available(self) -> bool:
+        """Return True if entity is available."""
+        return super().available and self._api.available
+
+    @property
+    def device_info(self):
+        """Return a device description for device registry."""
+        return self._api.device_info
+
+
+class MelCloudAccountSensor(
+    CoordinatorEntity[MelCloudDataUpdateCoordinator], SensorEntity
+):
+    """Diagnostic sensor about the MELCloud requests of an account."""
+
+    entity_description: MelcloudAccountSensorEntityDescription
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        coordinator: MelCloudDataUpdateCoordinator,
+        entry: ConfigEntry,
+        description: MelcloudAccountSensorEntityDescription,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"{entry.title} {description.name}"
+        self._attr_unique_id = f"{entry.entry_id}-{description.key}"
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self.entity_description.value_fn(self.coordinator.governor)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any]:
+        """Return the details behind the state."""
+        return self.entity_description.attributes_fn(self.coordinator.governor)
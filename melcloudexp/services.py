@@ -0,0 +1,144 @@
+"""Services of the MELCloud integration."""
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any
+
+from pymelcloud import ata_device, atw_device
+from pymelcloud.device import PROPERTY_POWER
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.helpers import (
+    config_validation as cv,
+    device_registry as dr,
+    entity_registry as er,
+)
+from homeassistant.helpers.service import async_extract_referenced_entity_ids
+
+from .const import ATTR_PROPERTIES, DOMAIN, SERVICE_SET_MANY
+
+if TYPE_CHECKING:
+    from . import MelCloudDevice
+    from .coordinator import MelCloudDataUpdateCoordinator
+
+# Devices written to at once across all accounts. The request governor of each
+# account limits the requests in flight further.
+MAX_PARALLEL_WRITES = 16
+
+# Value types of the pymelcloud device properties.
+PROPERTY_VALIDATORS = {
+    PROPERTY_POWER: cv.boolean,
+    ata_device.PROPERTY_TARGET_TEMPERATURE: vol.Coerce(float),
+    ata_device.PROPERTY_OPERATION_MODE: cv.string,
+    ata_device.PROPERTY_FAN_SPEED: cv.string,
+    ata_device.PROPERTY_VANE_HORIZONTAL: cv.string,
+    ata_device.PROPERTY_VANE_VERTICAL: cv.string,
+    atw_device.PROPERTY_TARGET_TANK_TEMPERATURE: vol.Coerce(float),
+    atw_device.PROPERTY_ZONE_1_TARGET_TEMPERATURE: vol.Coerce(float),
+    atw_device.PROPERTY_ZONE_2_TARGET_TEMPERATURE: vol.Coerce(float),
+    atw_device.PROPERTY_ZONE_1_OPERATION_MODE: cv.string,
+    atw_device.PROPERTY_ZONE_2_OPERATION_MODE: cv.string,
+}
+
+SET_MANY_SCHEMA = vol.Schema(
+    {
+        **cv.ENTITY_SERVICE_FIELDS,
+        vol.Required(ATTR_PROPERTIES): vol.All(
+            {
+                vol.Optional(key): validator
+                for key, validator in PROPERTY_VALIDATORS.items()
+            },
+            vol.Length(min=1),
+        ),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def async_set_many(call: ServiceCall) -> ServiceResponse:
+        """Write the same properties to every selected device."""
+        properties: dict[str, Any] = call.data[ATTR_PROPERTIES]
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_WRITES)
+
+        async def _async_set(mel_device: MelCloudDevice) -> dict[str, Any]:
+            async with semaphore:
+                try:
+                    await mel_device.async_set(properties)
+                except Exception as ex:  # pylint: disable=broad-except
+                    return {"name": mel_device.name, "success": False, "error": str(ex)}
+            if not mel_device.available:
+                return {
+                    "name": mel_device.name,
+                    "success": False,
+                    "error": "Device is unreachable",
+                }
+            return {"name": mel_device.name, "success": True}
+
+        async def _async_set_account(
+            coordinator: MelCloudDataUpdateCoordinator,
+            mel_devices: dict[str, MelCloudDevice],
+        ) -> dict[str, dict[str, Any]]:
+            results = await asyncio.gather(
+                *(_async_set(mel_device) for mel_device in mel_devices.values())
+            )
+            # Availability changes of the written devices reach no state listener.
+            coordinator.async_update_listeners()
+            return dict(zip(mel_devices, results))
+
+        results: dict[str, Any] = {}
+        for account_results in await asyncio.gather(
+            *(
+                _async_set_account(coordinator, mel_devices)
+                for coordinator, mel_devices in _async_selected_devices(
+                    hass, call
+                ).items()
+            )
+        ):
+            results.update(account_results)
+        return {"devices": results}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_MANY,
+        async_set_many,
+        schema=SET_MANY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+@callback
+def _async_selected_devices(
+    hass: HomeAssistant, call: ServiceCall
+) -> dict[MelCloudDataUpdateCoordinator, dict[str, MelCloudDevice]]:
+    """Return the selected devices by account, keyed by device registry ID."""
+    selected = async_extract_referenced_entity_ids(hass, call)
+    entity_registry = er.async_get(hass)
+    device_ids = set(selected.referenced_devices)
+    for entity_id in selected.referenced | selected.indirectly_referenced:
+        if (
+            entity := entity_registry.async_get(entity_id)
+        ) is not None and entity.device_id is not None:
+            device_ids.add(entity.device_id)
+
+    device_registry = dr.async_get(hass)
+    coordinator: MelCloudDataUpdateCoordinator
+    accounts: dict[MelCloudDataUpdateCoordinator, dict[str, MelCloudDevice]] = {}
+    for coordinator in hass.data.get(DOMAIN, {}).values():
+        for mel_device in coordinator.devices:
+            if (
+                device := device_registry.async_get_device(
+                    identifiers=mel_device.device_info["identifiers"]
+                )
+            ) is not None and device.id in device_ids:
+                accounts.setdefault(coordinator, {})[device.id] = mel_device
+    return accounts
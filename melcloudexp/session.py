@@ -0,0 +1,46 @@
+"""HTTP session shared by every MELCloud account."""
+from __future__ import annotations
+
+import aiohttp
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.util import ssl as ssl_util
+
+from .const import DOMAIN
+
+DATA_SESSION = f"{DOMAIN}_session"
+
+# Every account talks to the same host, the cap applies across all of them.
+MAX_CONNECTIONS = 16
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
+
+
+@callback
+def async_get_session(hass: HomeAssistant) -> aiohttp.ClientSession:
+    """Return the session shared by the MELCloud accounts.
+
+    Connections to MELCloud are kept alive between polls and the address of
+    the host is cached, which saves a TLS handshake and a DNS lookup on most
+    requests.
+    """
+    if (session := hass.data.get(DATA_SESSION)) is not None:
+        return session
+
+    connector = aiohttp.TCPConnector(
+        ssl=ssl_util.get_default_context(),
+        limit=MAX_CONNECTIONS,
+        limit_per_host=MAX_CONNECTIONS,
+        ttl_dns_cache=DNS_CACHE_TTL,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        enable_cleanup_closed=True,
+    )
+    session = hass.data[DATA_SESSION] = aiohttp.ClientSession(connector=connector)
+
+    async def _async_close_session(event: Event) -> None:
+        """Close the session."""
+        await hass.data.pop(DATA_SESSION).close()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close_session)
+    return session
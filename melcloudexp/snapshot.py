@@ -0,0 +1,96 @@
+"""Persistent device snapshots for the MELCloud integration."""
+from __future__ import annotations
+
+from typing import Any
+
+from pymelcloud import DEVICE_TYPE_ATA, DEVICE_TYPE_ATW, AtaDevice, AtwDevice, Device
+from pymelcloud.client import Client
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60
+
+_DEVICE_CLASSES: dict[str, type[Device]] = {
+    DEVICE_TYPE_ATA: AtaDevice,
+    DEVICE_TYPE_ATW: AtwDevice,
+}
+
+
+class DeviceSnapshotStore:
+    """Keep the last known devices of an account in Home Assistant storage.
+
+    The snapshot holds the device list, configuration and state so entities can
+    be created at startup without waiting for MELCloud.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the store."""
+        self._store: Store[dict[str, Any]] = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}"
+        )
+        self._save_scheduled = False
+
+    async def async_load_devices(
+        self, client: Client
+    ) -> dict[str, list[Device]] | None:
+        """Restore the devices of the last snapshot bound to the given client."""
+        if (data := await self._store.async_load()) is None:
+            return None
+
+        # pylint: disable=protected-access
+        client._account = data["account"]
+        client._device_confs = [device["conf"] for device in data["devices"]]
+        devices: dict[str, list[Device]] = {
+            device_type: [] for device_type in _DEVICE_CLASSES
+        }
+        for snapshot in data["devices"]:
+            device_type = snapshot["device_type"]
+            if (device_class := _DEVICE_CLASSES.get(device_type)) is None:
+                continue
+            device = device_class(
+                snapshot["conf"], client, set_debounce=client._device_set_debounce
+            )
+            device._state = snapshot["state"]
+            device._device_units = snapshot["units"]
+            device._energy_report = snapshot["energy_report"]
+            devices[device_type].append(device)
+        return devices
+
+    @callback
+    def async_schedule_save(self, client: Client, devices: list[Device]) -> None:
+        """Save a snapshot of the devices after a delay.
+
+        A save that is already scheduled is not postponed by later calls.
+        """
+        if self._save_scheduled:
+            return
+
+        @callback
+        def _data_to_save() -> dict[str, Any]:
+            # pylint: disable=protected-access
+            self._save_scheduled = False
+            return {
+                "account": client.account,
+                "devices": [
+                    {
+                        "device_type": device.device_type,
+                        "conf": device._device_conf,
+                        "state": device._state,
+                        "units": device._device_units,
+                        "energy_report": device._energy_report,
+                    }
+                    for device in devices
+                    if device._state is not None
+                ],
+            }
+
+        self._save_scheduled = True
+        self._store.async_delay_save(_data_to_save, SAVE_DELAY)
+
+    async def async_remove(self) -> None:
+        """Remove the snapshot."""
+        await self._store.async_remove()
@@ -0,0 +1,133 @@
+"""Request telemetry for the MELCloud integration."""
+from __future__ import annotations
+
+from collections import Counter, deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+import time
+from typing import Any, TypeVar
+
+_T = TypeVar("_T")
+
+# Upper bounds of the latency histogram buckets in seconds.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_RATE_WINDOW = 3600
+
+
+@dataclass
+class OperationStats:
+    """Latency and error statistics of one kind of MELCloud request."""
+
+    calls: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    @property
+    def mean_seconds(self) -> float | None:
+        """Return the mean latency."""
+        if not self.calls:
+            return None
+        return self.total_seconds / self.calls
+
+    def record(self, seconds: float, failed: bool) -> None:
+        """Add a finished request."""
+        self.calls += 1
+        self.errors += failed
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(LATENCY_BUCKETS)
+        self.buckets[index] += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics in a JSON serializable form."""
+        mean = self.mean_seconds
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "mean_ms": None if mean is None else round(mean * 1000, 1),
+            "max_ms": round(self.max_seconds * 1000, 1),
+            "histogram": {
+                **{
+                    f"le_{bound}s": count
+                    for bound, count in zip(LATENCY_BUCKETS, self.buckets)
+                },
+                "inf": self.buckets[-1],
+            },
+        }
+
+
+class ApiTelemetry:
+    """Collect latency, call rate and errors of the MELCloud requests of an account."""
+
+    def __init__(self) -> None:
+        """Initialize empty statistics."""
+        self.operations: dict[str, OperationStats] = {}
+        self.errors: Counter[str] = Counter()
+        self._calls: deque[float] = deque()
+
+    @property
+    def calls_per_hour(self) -> int:
+        """Return the number of requests made during the last hour."""
+        self._prune(time.monotonic())
+        return len(self._calls)
+
+    @property
+    def error_count(self) -> int:
+        """Return the number of failed requests."""
+        return sum(self.errors.values())
+
+    @property
+    def mean_latency(self) -> float | None:
+        """Return the mean latency of all requests in seconds."""
+        calls = sum(stats.calls for stats in self.operations.values())
+        if not calls:
+            return None
+        return sum(stats.total_seconds for stats in self.operations.values()) / calls
+
+    def _prune(self, now: float) -> None:
+        """Forget requests that fell out of the call rate window."""
+        while self._calls and self._calls[0] <= now - CALL_RATE_WINDOW:
+            self._calls.popleft()
+
+    def record(
+        self, operation: str, seconds: float, error: BaseException | None = None
+    ) -> None:
+        """Add a finished request."""
+        now = time.monotonic()
+        self._calls.append(now)
+        self._prune(now)
+        if (stats := self.operations.get(operation)) is None:
+            stats = self.operations[operation] = OperationStats()
+        stats.record(seconds, error is not None)
+        if error is not None:
+            self.errors[type(error).__name__] += 1
+
+    async def async_measure(
+        self, operation: str, call: Callable[[], Awaitable[_T]]
+    ) -> _T:
+        """Make a request and record how it went."""
+        start = time.monotonic()
+        try:
+            result = await call()
+        except Exception as err:  # pylint: disable=broad-except
+            self.record(operation, time.monotonic() - start, err)
+            raise
+        self.record(operation, time.monotonic() - start)
+        return result
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics in a JSON serializable form."""
+        return {
+            "calls_per_hour": self.calls_per_hour,
+            "errors": dict(self.errors),
+            "operations": {
+                operation: stats.as_dict()
+                for operation, stats in self.operations.items()
+            },
+        }
@@ -18,28 +18,48 @@ from homeassistant.components.water_heater import (
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import TEMP_CELSIUS
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from . import DOMAIN, MelCloudDevice
-from .const import ATTR_STATUS
+from .const import ATTR_PENDING, ATTR_STALE, ATTR_STATUS
+from .coordinator import DeviceContext, MelCloudDataUpdateCoordinator
+
+PARALLEL_UPDATES = 0
+
+# Device fields the tank temperature range is derived from.
+TANK_TEMPERATURE_MAX_FIELDS = frozenset({"MaxTankTemperature"})
 
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up MelCloud device climate based on config_entry."""
-    mel_devices = hass.data[DOMAIN][entry.entry_id]
-    async_add_entities(
-        [
-            AtwWaterHeater(mel_device, mel_device.device)
-            for mel_device in mel_devices[DEVICE_TYPE_ATW]
-        ],
-        True,
-    )
+    coordinator: MelCloudDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+
+    @callback
+    def _async_add_devices(mel_devices: list[MelCloudDevice]) -> None:
+        if entities := create_entities(coordinator, mel_devices):
+            async_add_entities(entities)
+
+    entry.async_on_unload(coordinator.async_add_ready_listener(_async_add_devices))
 
 
-class AtwWaterHeater(WaterHeaterEntity):
+def create_entities(
+    coordinator: MelCloudDataUpdateCoordinator, mel_devices: list[MelCloudDevice]
+) -> list[AtwWaterHeater]:
+    """Create the water heaters of devices."""
+    return [
+        AtwWaterHeater(coordinator, mel_device, mel_device.device)
+        for mel_device in mel_devices
+        if mel_device.device.device_type == DEVICE_TYPE_ATW
+    ]
+
+
+class AtwWaterHeater(
+    CoordinatorEntity[MelCloudDataUpdateCoordinator], WaterHeaterEntity
+):
     """Air-to-Water water heater."""
 
     _attr_supported_features = (
@@ -47,15 +67,22 @@ class AtwWaterHeater(WaterHeaterEntity):
         | WaterHeaterEntityFeature.OPERATION_MODE
     )
 
-    def __init__(self, api: MelCloudDevice, device: AtwDevice) -> None:
+    def __init__(
+        self,
+        coordinator: MelCloudDataUpdateCoordinator,
+        api: MelCloudDevice,
+        device: AtwDevice,
+    ) -> None:
         """Initialize water heater device."""
+        super().__init__(coordinator, DeviceContext(api))
         self._api = api
         self._device = device
         self._name = device.name
 
-    async def async_update(self) -> None:
-        """Update state from MELCloud."""
-        await self._api.async_update()
+    @property
+    def available(self) -> bool:
+        """Return True if entity is available."""
+        return super().available and self._api.available
 
     @property
     def unique_id(self) -> str | None:
@@ -74,16 +101,22 @@ class AtwWaterHeater(WaterHeaterEntity):
 
     async def async_turn_on(self) -> None:
         """Turn the entity on."""
-        await self._device.set({PROPERTY_POWER: True})
+        await self._api.async_set({PROPERTY_POWER: True})
+        self.async_write_ha_state()
 
     async def async_turn_off(self) -> None:
         """Turn the entity off."""
-        await self._device.set({PROPERTY_POWER: False})
+        await self._api.async_set({PROPERTY_POWER: False})
+        self.async_write_ha_state()
 
     @property
     def extra_state_attributes(self):
         """Return the optional state attributes with device specific additions."""
         data = {ATTR_STATUS: self._device.status}
+        if self._api.pending:
+            data[ATTR_PENDING] = True
+        if self._api.stale:
+            data[ATTR_STALE] = True
         return data
 
     @property
@@ -99,7 +132,9 @@ class AtwWaterHeater(WaterHeaterEntity):
     @property
     def operation_list(self) -> list[str]:
         """Return the list of available operation modes as reported by pymelcloud."""
-        return self._device.operation_modes
+        return self._api.capability(
+            "water_heater_operation_modes", (), lambda: self._device.operation_modes
+        )
 
     @property
     def current_temperature(self) -> float | None:
@@ -113,17 +148,19 @@ class AtwWaterHeater(WaterHeaterEntity):
 
     async def async_set_temperature(self, **kwargs: Any) -> None:
         """Set new target temperature."""
-        await self._device.set(
+        await self._api.async_set(
             {
                 PROPERTY_TARGET_TANK_TEMPERATURE: kwargs.get(
                     "temperature", self.target_temperature
                 )
             }
         )
+        self.async_write_ha_state()
 
     async def async_set_operation_mode(self, operation_mode: str) -> None:
         """Set new target operation mode."""
-        await self._device.set({PROPERTY_OPERATION_MODE: operation_mode})
+        await self._api.async_set({PROPERTY_OPERATION_MODE: operation_mode})
+        self.async_write_ha_state()
 
     @property
     def min_temp(self) -> float:
@@ -133,4 +170,8 @@ class AtwWaterHeater(WaterHeaterEntity):
     @property
     def max_temp(self) -> float:
         """Return the maximum temperature."""
-        return self._device.target_tank_temperature_max or DEFAULT_MAX_TEMP
+        return self._api.capability(
+            "tank_temperature_max",
+            TANK_TEMPERATURE_MAX_FIELDS,
+            lambda: self._device.target_tank_temperature_max or DEFAULT_MAX_TEMP,
+        )